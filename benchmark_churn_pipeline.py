@@ -0,0 +1,259 @@
+"""
+Benchmark harness for the churn pipeline.
+
+Generates synthetic datasets with the advanced schema at several sizes, then
+times each pipeline stage (load_data, calculate_monthly_churn_rates,
+prepare_ml_data, train_ml_model, predict_churn; the import of the ML
+libraries, done lazily by the pipeline, is timed as a separate
+import_ml_libraries stage) and records the change in
+resident memory (RSS) over each stage, plus the peak RSS of the whole run.
+Every size runs in a fresh process so that the memory figures do not leak
+from one size to the next.
+
+Results are written as JSON so that runs of different versions can be
+compared with --compare.
+
+--check-startup only measures how long a fresh interpreter takes to import
+churn_calculator_ml and checks that no plotting/ML library is loaded by the
+import; it exits with status 1 when the startup budget is exceeded.
+
+Usage:
+    python benchmark_churn_pipeline.py --sizes 10000 100000 --output bench.json
+    python benchmark_churn_pipeline.py --sizes 10000 --compare old_bench.json
+    python benchmark_churn_pipeline.py --check-startup --startup-budget 1.0
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from churn_metrics import current_rss_mb, peak_rss_mb
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+STAGES = ['load_data', 'calculate_monthly_churn_rates', 'prepare_ml_data',
+          'train_ml_model', 'predict_churn']
+DEFAULT_DATA_DIR = 'benchmark_data'
+# The ML libraries are imported lazily by the pipeline: their import is timed as
+# its own stage before the first ML stage instead of inflating that stage
+IMPORT_STAGE = 'import_ml_libraries'
+ML_STAGES = ('prepare_ml_data', 'train_ml_model', 'predict_churn')
+ML_MODULES = ('sklearn.preprocessing', 'sklearn.ensemble', 'sklearn.metrics',
+              'sklearn.model_selection', 'churn_search')
+BENCHMARK_SEED = 42
+
+# Startup check: module imported by rate-only runs and libraries it must not load
+STARTUP_MODULE = 'churn_calculator_ml'
+HEAVY_MODULES = ('sklearn', 'scipy', 'matplotlib', 'seaborn')
+DEFAULT_STARTUP_BUDGET = 1.0
+STARTUP_RUNS = 5
+
+
+def dataset_path(data_dir, size):
+    """Path of the generated dataset for a given number of rows."""
+    return os.path.join(data_dir, f"customer_data_advanced_{size}.csv")
+
+
+def ensure_dataset(data_dir, size):
+    """Generate the advanced-schema dataset for a size unless it already exists."""
+    path = dataset_path(data_dir, size)
+    if os.path.exists(path):
+        return path
+    import customer_data_generator as generator
+
+    os.makedirs(data_dir, exist_ok=True)
+    print(f"Generating {size} customers into {path}...")
+    # Fixed seed so that every version is benchmarked on the same data
+    generator.generate_dataset('advanced', size, path, seed=BENCHMARK_SEED, workers=os.cpu_count() or 1)
+    return path
+
+
+def run_size(path, size, stages, year):
+    """
+    Run the selected stages on one dataset (executed in a child process).
+
+    :return: Dict with per-stage seconds and RSS change (MB), and the peak RSS of the run
+    """
+    import importlib
+
+    from churn_calculator_ml import ChurnCalculator
+
+    selected = [stage for stage in STAGES if stage in stages or stage == 'load_data']
+    ml_stages = [stage for stage in selected if stage in ML_STAGES]
+    if ml_stages:
+        selected.insert(selected.index(ml_stages[0]), IMPORT_STAGE)
+
+    results = {'rows': size, 'stages': {}}
+    calculator = None
+    # The pipeline prints reports; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for stage in selected:
+            rss_before = current_rss_mb()
+            started = time.perf_counter()
+            if stage == IMPORT_STAGE:
+                for module in ML_MODULES:
+                    importlib.import_module(module)
+            elif stage == 'load_data':
+                calculator = ChurnCalculator(path, use_cache=False)
+            elif stage == 'calculate_monthly_churn_rates':
+                calculator.calculate_monthly_churn_rates(year)
+            elif stage == 'prepare_ml_data':
+                calculator.prepare_ml_data(fit_encoders=True)
+            elif stage == 'train_ml_model':
+                calculator.train_ml_model()
+            elif stage == 'predict_churn':
+                if calculator.model is None:
+                    calculator.train_ml_model()
+                    rss_before = current_rss_mb()
+                    started = time.perf_counter()
+                calculator.predict_churn()
+            seconds = round(time.perf_counter() - started, 4)
+            rss_after = current_rss_mb()
+            results['stages'][stage] = {
+                'seconds': seconds,
+                # The process-wide peak only grows: the per-stage figure is the RSS change
+                'rss_delta_mb': (round(rss_after - rss_before, 1)
+                                 if rss_after is not None and rss_before is not None else None),
+            }
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def measure_startup(module=STARTUP_MODULE, runs=STARTUP_RUNS):
+    """
+    Import time of a module in fresh interpreters.
+
+    :param module: Module to import
+    :param runs: Number of interpreters started (the median time is reported)
+    :return: Tuple (median seconds, sorted list of HEAVY_MODULES loaded by the import)
+    """
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - started)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    timings, loaded = [], set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.splitlines()
+        timings.append(float(output[0]))
+        loaded.update(name for name in output[1].split(',') if name)
+    return sorted(timings)[len(timings) // 2], sorted(loaded)
+
+
+def check_startup(budget):
+    """
+    Check the import time of STARTUP_MODULE against a budget.
+
+    :param budget: Maximum median import time in seconds
+    :return: True if within budget and no heavy module was imported
+    """
+    seconds, loaded = measure_startup()
+    print(f"import {STARTUP_MODULE}: {seconds:.3f}s (budget {budget:.3f}s)")
+    if loaded:
+        print(f"  heavy modules imported at startup: {', '.join(loaded)}")
+    return seconds <= budget and not loaded
+
+
+def environment_info():
+    """Versions and host information stored with the results."""
+    import numpy
+    import pandas
+    import sklearn
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pandas.__version__,
+        'numpy': numpy.__version__,
+        'scikit-learn': sklearn.__version__,
+    }
+
+
+def compare(results, baseline):
+    """Print the speed ratio of each stage against a previous results file."""
+    previous = {run['rows']: run['stages'] for run in baseline['runs']}
+    print(f"\nComparison with {baseline['environment'].get('git_commit')} "
+          f"({baseline['environment'].get('timestamp')}):")
+    for run in results['runs']:
+        old_stages = previous.get(run['rows'])
+        if old_stages is None:
+            continue
+        for stage, values in run['stages'].items():
+            if stage not in old_stages:
+                continue
+            old, new = old_stages[stage]['seconds'], values['seconds']
+            ratio = old / new if new > 0 else float('inf')
+            print(f"  {run['rows']:>10} {stage:<32} {old:>9.3f}s -> {new:>9.3f}s  ({ratio:.2f}x)")
+
+
+def main(argv=None):
+    """Run the benchmark and write the results file."""
+    parser = argparse.ArgumentParser(description="Benchmark the churn pipeline at scale.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Dataset sizes (rows) to benchmark")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                        help="Pipeline stages to time")
+    parser.add_argument('--year', type=int, default=datetime.now().year - 1,
+                        help="Year used for the monthly churn rates")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help="Directory for the generated datasets (reused between runs)")
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help="Results file (JSON)")
+    parser.add_argument('--compare', help="Previous results file to compare against")
+    parser.add_argument('--check-startup', action='store_true',
+                        help=f"Only check the import time of {STARTUP_MODULE} (exit status 1 if over budget)")
+    parser.add_argument('--startup-budget', type=float, default=DEFAULT_STARTUP_BUDGET,
+                        help="Startup budget in seconds for --check-startup")
+    args = parser.parse_args(argv)
+
+    if args.check_startup:
+        return 0 if check_startup(args.startup_budget) else 1
+
+    results = {'environment': environment_info(), 'year': args.year, 'runs': []}
+    for size in args.sizes:
+        path = ensure_dataset(args.data_dir, size)
+        # A fresh process per size keeps the peak RSS figures independent
+        with ProcessPoolExecutor(max_workers=1,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            run = pool.submit(run_size, path, size, args.stages, args.year).result()
+        results['runs'].append(run)
+        for stage, values in run['stages'].items():
+            print(f"{size:>10} {stage:<32} {values['seconds']:>9.3f}s  "
+                  f"RSS change {values['rss_delta_mb']} MB")
+        print(f"{size:>10} {'peak RSS':<32} {run['peak_rss_mb']} MB")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
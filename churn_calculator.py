@@ -13,26 +13,96 @@ For this initial version, we will:
 - Assume the data contains at least 'customer_id' and 'status' columns.
 - Define 'churned' customers as those with status 'churned'.
 - Calculate the churn rate for a given period.
+
+Very large exports can be processed in streaming mode, which reads only the
+'status' column in fixed-size chunks (optionally from .gz/.zst files) and
+keeps memory usage constant regardless of the file size.
 """
 
+import argparse
+import importlib.util
+import os
+import sys
+
 import pandas as pd
 
+from customer_store import load_customer_data
+
+REQUIRED_COLUMNS = ['customer_id', 'status']
+
+# Rows per chunk in streaming mode
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+def _require_zstandard(csv_file_path, compression):
+    """Fail with a clear message when a .zst input needs the optional 'zstandard' package."""
+    if isinstance(compression, dict):
+        compression = compression.get('method')
+    is_zstd = compression == 'zstd' or (
+        compression == 'infer' and str(os.fspath(csv_file_path)).lower().endswith('.zst')
+    )
+    if is_zstd and importlib.util.find_spec('zstandard') is None:
+        raise ImportError("Reading .zst files needs the optional 'zstandard' package "
+                          "(pip install zstandard)")
+
+
+def _count_churned_streaming(csv_file_path, chunk_size, compression):
+    """
+    Count total and churned customers by reading the file chunk by chunk.
 
-def calculate_churn_rate(csv_file_path):
+    :return: Tuple (total_customers, churned_customers)
+    """
+    _require_zstandard(csv_file_path, compression)
+    # Validate required columns from the header only
+    header = pd.read_csv(csv_file_path, nrows=0, compression=compression)
+    if not all(col in header.columns for col in REQUIRED_COLUMNS):
+        raise ValueError(f"CSV file must contain columns: {REQUIRED_COLUMNS}")
+
+    total_customers = 0
+    churned_customers = 0
+    reader = pd.read_csv(
+        csv_file_path,
+        usecols=['status'],
+        dtype={'status': 'category'},
+        chunksize=chunk_size,
+        compression=compression,
+    )
+    for chunk in reader:
+        status = chunk['status']
+        total_customers += len(status)
+        # Compare on the (few) categories instead of every row
+        churned_categories = [c for c in status.cat.categories if str(c).lower() == 'churned']
+        churned_customers += int(status.isin(churned_categories).sum())
+    return total_customers, churned_customers
+
+
+def calculate_churn_rate(csv_file_path, streaming=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                         compression='infer'):
     """
     Calculates the churn rate based on customer data in a CSV file.
 
     :param csv_file_path: Path to the CSV file containing customer data.
+    :param streaming: If True, read the file in chunks with constant memory.
+    :param chunk_size: Rows per chunk in streaming mode.
+    :param compression: Compression of the input in streaming mode ('infer' detects
+                        .gz and .zst from the extension; .zst requires 'zstandard').
     :return: Churn rate as a percentage.
     """
     try:
-        # Read the CSV file
-        df = pd.read_csv(csv_file_path)
+        if streaming:
+            total_customers, churned_customers = _count_churned_streaming(
+                csv_file_path, chunk_size, compression
+            )
+            if total_customers == 0:
+                return 0.0
+            return (churned_customers / total_customers) * 100
+
+        # Read only the columns we need (through the Parquet cache when available)
+        df = load_customer_data(csv_file_path, columns=REQUIRED_COLUMNS)
         
         # Validate required columns
-        required_columns = ['customer_id', 'status']
-        if not all(col in df.columns for col in required_columns):
-            raise ValueError(f"CSV file must contain columns: {required_columns}")
+        if not all(col in df.columns for col in REQUIRED_COLUMNS):
+            raise ValueError(f"CSV file must contain columns: {REQUIRED_COLUMNS}")
         
         # Count total customers
         total_customers = len(df)
@@ -55,22 +125,50 @@ def calculate_churn_rate(csv_file_path):
         return None
 
 
-def main():
+def main(argv=None):
     """
     Main function to run the churn rate calculator.
+
+    The CSV path can be given on the command line; without it the script
+    asks for it interactively.
+
+    :param argv: Arguments (default: sys.argv[1:])
+    :return: Exit status (1 when the churn rate could not be calculated)
     """
-    print("Churn Rate Calculator for Energy and Gas Companies")
-    print("--------------------------------------------------")
+    parser = argparse.ArgumentParser(
+        description="Churn Rate Calculator for Energy and Gas Companies"
+    )
+    parser.add_argument('csv_file', nargs='?', help="Customer data CSV file (prompted if omitted)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Read only the status column in chunks (constant memory)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows per chunk in streaming mode")
+    parser.add_argument('--compression', default='infer',
+                        help="Compression of the input file in streaming mode (default: from the extension)")
+    parser.add_argument('--quiet', action='store_true', help="Print only the churn rate")
+    args = parser.parse_args(argv)
+
+    if not args.quiet:
+        print("Churn Rate Calculator for Energy and Gas Companies")
+        print("--------------------------------------------------")
     
-    # Get CSV file path from user
-    csv_file_path = input("Enter the path to your customer data CSV file: ").strip()
+    # Get CSV file path from the command line or from the user
+    csv_file_path = args.csv_file
+    if csv_file_path is None:
+        csv_file_path = input("Enter the path to your customer data CSV file: ").strip()
     
     # Calculate churn rate
-    churn_rate = calculate_churn_rate(csv_file_path)
+    churn_rate = calculate_churn_rate(csv_file_path, streaming=args.streaming,
+                                      chunk_size=args.chunk_size, compression=args.compression)
     
-    if churn_rate is not None:
+    if churn_rate is None:
+        return 1
+    if args.quiet:
+        print(f"{churn_rate:.2f}")
+    else:
         print(f"\nChurn Rate: {churn_rate:.2f}%")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -1,37 +1,167 @@
+"""
+Churn rate calculator with churn prediction.
+
+Only pandas/numpy and the local data modules are imported at start-up:
+scikit-learn is imported when a model is trained or scored and matplotlib
+when a chart is drawn, so rates-only runs start quickly and never load a GUI
+backend.
+"""
+
+import contextlib
+import sqlite3
+import sys
+
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import classification_report, confusion_matrix
-import matplotlib.pyplot as plt
-import seaborn as sns
-import warnings
-warnings.filterwarnings('ignore')
+
+from customer_store import load_customer_data
+from customer_validation import VALIDATION_MODES, ValidationError, load_validated_customer_data
+from churn_periods import (
+    ContractIntervalIndex, ROLLUP_GRAINS, month_periods, parse_periods, period_results,
+    rollup_results, segment_period_counts, segment_results
+)
+from churn_cohorts import cohort_retention
+from churn_feature_store import write_feature_store, load_feature_store
+from churn_features import (
+    build_feature_frame, fit_label_encoders, encode_categoricals,
+    select_feature_columns, to_feature_matrix
+)
+from churn_scoring import (
+    data_fingerprint, save_model_bundle, load_model_bundle, select_high_risk,
+    score_in_batches, score_parallel, DEFAULT_BATCH_SIZE, DEFAULT_TOP_K
+)
+
+# Storage of the customer data: in memory (pandas) or in an embedded database (churn_sql)
+BACKENDS = ('pandas', 'sqlite')
 
 class ChurnCalculator:
-    def __init__(self, data_file):
+    def __init__(self, data_file, columns=None, use_cache=True, metrics=None, validation=None,
+                 backend='pandas', database=None, load=True):
         """
         Initialize the Churn Calculator with customer data.
         
-        :param data_file: Path to the CSV file containing customer data
+        :param data_file: Path to the CSV file containing customer data, or a list of
+                          paths, a directory or a glob pattern of partition files (loaded
+                          in parallel, with a 'source_partition' column)
+        :param columns: Optional list of columns to load (e.g. customer_store.RATE_COLUMNS
+                        when only churn rates are needed)
+        :param use_cache: If True, load through the on-disk Parquet cache when available
+        :param metrics: Optional churn_metrics.StageMetrics: every public method call
+                        (load_data included) is recorded as a stage
+        :param validation: Optional validation of the input (see customer_validation):
+                           'raise' raises ValidationError on any invalid row,
+                           'quarantine' drops the invalid rows into self.quarantined
+        :param backend: 'pandas' (default) loads the data into ``self.df``; 'sqlite'
+                        bulk-loads it into an SQLite file (see churn_sql) and computes the
+                        churn rates there, for exports larger than memory (``self.df``
+                        stays None, so the ML and cohort methods are not available)
+        :param database: SQLite file of the 'sqlite' backend (default: <data_file>.sqlite)
+        :param load: If False, the data is not loaded now (``self.df`` stays None until
+                     load_data is called), e.g. to train from a feature store only
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}: expected one of {BACKENDS}")
+        if backend == 'sqlite' and validation is not None:
+            raise ValueError("Input validation needs the pandas backend")
         self.data_file = data_file
+        self.columns = columns
+        self.use_cache = use_cache
+        self.validation = validation
+        self.validation_report = None
+        self.quarantined = None
+        self.backend = backend
+        self.database = database
+        self.sql_store = None
         self.df = None
         self.model = None
         self.label_encoders = {}
-        self.load_data()
+        self.feature_columns = None
+        self.training_fingerprint = None
+        self._contract_index = None
+        self._monthly_counts_cache = None
+        self._feature_cache = None
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.instrument(self)
+        if load:
+            self.load_data()
     
     def load_data(self):
-        """Load customer data from CSV file."""
-        try:
-            self.df = pd.read_csv(self.data_file)
-            print(f"Successfully loaded data with {len(self.df)} customers")
-        except Exception as e:
-            print(f"Error loading data: {e}")
+        """Load customer data from CSV file into a typed DataFrame (see customer_store)."""
+        if self.backend == 'sqlite':
+            self._load_sql_store()
             return None
+        # Errors are not caught: a failed load must stop the run, not leave an
+        # empty calculator. Status messages go to stderr so that the results on
+        # stdout stay machine-readable.
+        if self.validation is not None:
+            self.df, self.validation_report, self.quarantined = load_validated_customer_data(
+                self.data_file, self.validation, columns=self.columns
+            )
+            if self.quarantined is not None:
+                print(f"Quarantined {len(self.quarantined)} invalid rows:\n{self.validation_report}",
+                      file=sys.stderr)
+        else:
+            self.df = load_customer_data(self.data_file, columns=self.columns,
+                                         use_cache=self.use_cache)
+        print(f"Successfully loaded data with {len(self.df)} customers", file=sys.stderr)
     
+    def _load_sql_store(self):
+        """Open the SQLite database of the 'sqlite' backend, (re)loading the source if it changed."""
+        from churn_sql import SqlChurnStore, default_database_path
+
+        if self.sql_store is None:
+            self.sql_store = SqlChurnStore(self.database or default_database_path(self.data_file))
+        if self.sql_store.ensure_loaded(self.data_file):
+            self._monthly_counts_cache = None
+            print(f"Loaded {len(self.sql_store)} customers into {self.sql_store.path}", file=sys.stderr)
+        else:
+            print(f"Using {len(self.sql_store)} customers from {self.sql_store.path}", file=sys.stderr)
+
+    def _require_frame(self, what):
+        """Methods that work on the customer DataFrame are not available with the SQL backend."""
+        if self.sql_store is not None:
+            raise ValueError(f"{what} needs the pandas backend (the data is in {self.sql_store.path})")
+
+    @property
+    def contract_index(self):
+        """
+        Interval index of the loaded contracts (see churn_periods.ContractIntervalIndex).
+
+        The index is built once per DataFrame and reused for every period,
+        point-in-time and range query until ``self.df`` is replaced. With the
+        'sqlite' backend the churn_sql.SqlChurnStore answers the same queries.
+        """
+        if self.sql_store is not None:
+            return self.sql_store
+        if self._contract_index is None or self._contract_index[0] is not self.df:
+            self._contract_index = (self.df, ContractIntervalIndex.from_frame(self.df))
+        return self._contract_index[1]
+
+    def active_customers_at(self, date):
+        """
+        Customer ids of the contracts active at a date.
+
+        :param date: Date (YYYY-MM-DD or datetime-like)
+        :return: Array of customer ids
+        """
+        return self.contract_index.active_set_at(date)
+
+    def calculate_churn_for_periods(self, periods):
+        """
+        Calculate churn rates for an arbitrary list of periods in one pass.
+
+        :param periods: Iterable of (start_date, end_date) pairs (YYYY-MM-DD or datetime-like)
+        :return: List of dicts with the same keys as calculate_period_churn_rate
+        """
+        periods = list(periods)
+        if not periods:
+            return []
+        start_dates, end_dates = parse_periods(periods)
+        at_start, at_end, churned = self.contract_index.period_counts(start_dates, end_dates)
+        return period_results(start_dates, end_dates, at_start, at_end, churned)
+
     def calculate_period_churn_rate(self, start_date, end_date):
         """
         Calculate churn rate for a specific period.
@@ -40,262 +170,388 @@ class ChurnCalculator:
         :param end_date: End date of the period (YYYY-MM-DD)
         :return: Churn rate for the period
         """
-        # Convert string dates to datetime
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
-        
-        # Customers at the start of the period
-        customers_at_start = self.df[
-            (pd.to_datetime(self.df['contract_start_date']) <= start_date) &
-            (self.df['contract_end_date'].isna() | (pd.to_datetime(self.df['contract_end_date']) > start_date))
-        ]
-        
-        # Customers at the end of the period
-        customers_at_end = self.df[
-            (pd.to_datetime(self.df['contract_start_date']) <= end_date) &
-            (self.df['contract_end_date'].isna() | (pd.to_datetime(self.df['contract_end_date']) > end_date))
-        ]
-        
-        # Customers who churned during the period
-        churned_customers = self.df[
-            (pd.to_datetime(self.df['contract_end_date']) > start_date) &
-            (pd.to_datetime(self.df['contract_end_date']) <= end_date)
-        ]
-        
-        # Calculate churn rate
-        if len(customers_at_start) > 0:
-            churn_rate = (len(churned_customers) / len(customers_at_start)) * 100
-            return {
-                'period': f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-                'customers_at_start': len(customers_at_start),
-                'customers_at_end': len(customers_at_end),
-                'churned_customers': len(churned_customers),
-                'churn_rate': round(churn_rate, 2)
-            }
-        else:
-            return {
-                'period': f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-                'customers_at_start': 0,
-                'customers_at_end': 0,
-                'churned_customers': 0,
-                'churn_rate': 0.0
-            }
+        return self.calculate_churn_for_periods([(start_date, end_date)])[0]
     
-    def calculate_monthly_churn_rates(self, year):
+    def _segment_counts(self, start_dates, end_dates, by):
+        """Segment table and (segments, periods) count arrays for a list of periods."""
+        if self.sql_store is not None:
+            return self.sql_store.segment_counts(start_dates, end_dates, by)
+        by = [by] if isinstance(by, str) else list(by)
+        missing = [col for col in by if col not in self.df.columns]
+        if missing:
+            raise ValueError(f"Segment columns not in the data: {missing}")
+
+        groups = self.df.groupby(by, observed=True, dropna=False, sort=True)
+        codes = groups.ngroup().to_numpy()
+        segments = groups.size().index.to_frame(index=False)
+
+        counts = segment_period_counts(
+            codes, len(segments),
+            pd.to_datetime(self.df['contract_start_date']).to_numpy(dtype='datetime64[ns]'),
+            pd.to_datetime(self.df['contract_end_date']).to_numpy(dtype='datetime64[ns]'),
+            start_dates.to_numpy(dtype='datetime64[ns]'), end_dates.to_numpy(dtype='datetime64[ns]')
+        )
+        return segments, counts
+
+    def calculate_segmented_churn_for_periods(self, periods, by):
+        """
+        Calculate churn rates for every segment x period cell in one pass.
+
+        :param periods: Iterable of (start_date, end_date) pairs
+        :param by: Segment column or list of columns (e.g. churn_periods.SEGMENT_COLUMNS
+                   entries); a list gives every combination present in the data
+        :return: DataFrame with the segment columns, period, customers_at_start,
+                 customers_at_end, churned_customers and churn_rate, one row per
+                 segment and period (missing segment values form their own segment)
+        """
+        start_dates, end_dates = parse_periods(periods)
+        segments, counts = self._segment_counts(start_dates, end_dates, by)
+        return segment_results(segments, start_dates, end_dates, *counts)
+
+    def _monthly_counts(self, year, by=None):
+        """
+        Month-level counts of a year, computed once per year (and segments).
+
+        The counts are cached until ``self.df`` is replaced, so the monthly,
+        quarterly, half-year and annual tables of the same year (e.g. the
+        report and then plot_churn_trends) share a single pass over the data.
+
+        :return: Tuple (month starts, month ends, segment table or None,
+                 (customers_at_start, customers_at_end, churned_customers))
+        """
+        if self._monthly_counts_cache is None or self._monthly_counts_cache[0] is not self.df:
+            self._monthly_counts_cache = (self.df, {})
+        cache = self._monthly_counts_cache[1]
+        key = (year, None if by is None else tuple([by] if isinstance(by, str) else by))
+        if key not in cache:
+            start_dates, end_dates = parse_periods(month_periods(year))
+            if by is None:
+                segments = None
+                counts = self.contract_index.period_counts(start_dates, end_dates)
+            else:
+                segments, counts = self._segment_counts(start_dates, end_dates, by)
+            cache[key] = (start_dates, end_dates, segments, counts)
+        return cache[key]
+
+    def calculate_rollup_churn_rates(self, year, grain='quarter', by=None):
+        """
+        Calculate churn rates of a year at a given granularity.
+
+        Every granularity is derived from the cached month-level counts of the
+        year (churn_periods.rollup_counts), so after the monthly pass the
+        quarterly, half-year and annual tables cost no further scan.
+
+        :param year: Calendar year
+        :param grain: 'month', 'quarter', 'half' or 'year' (see churn_periods.ROLLUP_GRAINS)
+        :param by: Optional segment column(s): rates per segment and period
+                   (see calculate_segmented_churn_for_periods)
+        :return: DataFrame with one row per period (and segment), numbered in
+                 a column named after the grain ('year' holds the year itself)
+        """
+        if grain not in ROLLUP_GRAINS:
+            raise ValueError(f"Unknown grain {grain!r}: expected one of {list(ROLLUP_GRAINS)}")
+        start_dates, end_dates, segments, counts = self._monthly_counts(year, by)
+        return rollup_results(year, grain, start_dates, end_dates, counts, segments)
+
+    def calculate_monthly_churn_rates(self, year, by=None):
         """
         Calculate monthly churn rates for a specific year.
         
         :param year: Year for which to calculate monthly churn rates
+        :param by: Optional segment column(s): rates per segment and month
+                   (see calculate_segmented_churn_for_periods)
         :return: DataFrame with monthly churn rates
         """
-        monthly_rates = []
-        
-        for month in range(1, 13):
-            # Calculate start and end dates for the month
-            start_date = f"{year}-{month:02d}-01"
-            
-            # Calculate end date of the month
-            if month == 12:
-                end_date = f"{year+1}-01-01"
-            else:
-                end_date = f"{year}-{month+1:02d}-01"
-            
-            # Calculate churn rate for the month
-            result = self.calculate_period_churn_rate(start_date, end_date)
-            result['month'] = month
-            monthly_rates.append(result)
-        
-        return pd.DataFrame(monthly_rates)
+        return self.calculate_rollup_churn_rates(year, 'month', by)
     
-    def calculate_quarterly_churn_rates(self, year):
+    def calculate_quarterly_churn_rates(self, year, by=None):
         """
         Calculate quarterly churn rates for a specific year.
         
         :param year: Year for which to calculate quarterly churn rates
+        :param by: Optional segment column(s): rates per segment and quarter
+                   (see calculate_segmented_churn_for_periods)
         :return: DataFrame with quarterly churn rates
         """
-        quarterly_rates = []
-        quarters = [(1, 3), (4, 6), (7, 9), (10, 12)]
-        
-        for i, (start_month, end_month) in enumerate(quarters, 1):
-            # Calculate start and end dates for the quarter
-            start_date = f"{year}-{start_month:02d}-01"
-            
-            # Calculate end date of the quarter
-            if end_month == 12:
-                end_date = f"{year+1}-01-01"
-            else:
-                end_date = f"{year}-{end_month+1:02d}-01"
-            
-            # Calculate churn rate for the quarter
-            result = self.calculate_period_churn_rate(start_date, end_date)
-            result['quarter'] = i
-            quarterly_rates.append(result)
-        
-        return pd.DataFrame(quarterly_rates)
-    
-    def prepare_ml_data(self):
-        """Prepare data for machine learning model."""
-        # Create a copy of the dataframe for ML
-        ml_df = self.df.copy()
-        
-        # Create target variable (churned or not)
-        # A customer is considered churned if they have an end date
-        ml_df['churned'] = ~ml_df['contract_end_date'].isna()
-        
-        # Data preparation
-        ml_df['contract_start_date'] = pd.to_datetime(ml_df['contract_start_date'])
-        ml_df['contract_end_date'] = pd.to_datetime(ml_df['contract_end_date'])
-        
-        # Feature engineering
-        # 1. Calculate tenure in days
-        # For active customers, use today's date as end date for tenure calculation
-        ml_df['tenure_days'] = (
-            ml_df['contract_end_date'].fillna(pd.to_datetime('today')) - 
-            ml_df['contract_start_date']
-        ).dt.days
-
-        # 2. Calculate average monthly charge
-        # Avoid division by zero
-        ml_df['avg_monthly_charge'] = np.where(
-            ml_df['tenure_months'] > 0, 
-            ml_df['total_charges'] / ml_df['tenure_months'], 
-            ml_df['monthly_charges']
-        )
+        return self.calculate_rollup_churn_rates(year, 'quarter', by)
 
-        # 3. Calculate days since last interaction (proxy: days since contract start for active, or until end for churned)
-        reference_date = pd.to_datetime('today')
-        ml_df['days_since_last_interaction'] = (
-            reference_date - ml_df['contract_start_date']
-        ).dt.days
-        
-        # Encode categorical variables
-        # Expanded list of categorical columns that might be in the advanced dataset
-        categorical_columns = [
-            'payment_method', 'service_type', 'contract_type', 
-            'billing_method', 'customer_tenure_type' # 'customer_age_group' if added
-        ]
-        
-        for col in categorical_columns:
-            if col in ml_df.columns:
-                le = LabelEncoder()
-                # Fill NaNs with a placeholder string for encoding
-                ml_df[col + '_encoded'] = le.fit_transform(ml_df[col].fillna('Unknown').astype(str))
-                self.label_encoders[col] = le
-        
-        # Select features for the model
-        # Added 'avg_monthly_charge' and 'days_since_last_interaction'
-        # Check for new potential features from enriched dataset
-        potential_new_features = [
-            'avg_monthly_consumption_kwh',
-            'num_support_contacts_last_year',
-            # --- Nuove features avanzate ---
-            'consumption_volatility',
-            'consumption_trend',
-            'consumption_vs_local_avg_ratio',
-            'peak_hour_consumption_ratio',
-            'smart_meter_flag',
-            'has_promo',
-            'days_since_last_promo_end',
-            'num_price_changes_last_year',
-            'last_bill_amount_vs_avg',
-            'num_late_payments',
-            'avg_days_late_payment',
-            'billing_method_encoded', # Assuming this will be encoded
-            'contract_renewal_reminder_sent',
-            'days_to_contract_end',
-            'has_online_account',
-            'num_logins_last_month',
-            'num_paperless_bills_sent',
-            'last_survey_satisfaction_score',
-            'num_complaints_last_year', # Subset of support contacts
-            'complaint_resolution_time_avg',
-            # Demographic/Location (if available)
-            # 'customer_age_group_encoded',
-            # 'customer_tenure_type_encoded',
-            # 'urban_rural_flag',
-            # 'postal_code_energy_competition_index'
-        ]
-        
-        feature_columns = [
-            'monthly_charges', 'total_charges', 'tenure_months', 
-            'tenure_days', 'avg_monthly_charge', 'days_since_last_interaction',
-            'payment_method_encoded', 'service_type_encoded', 
-            'contract_type_encoded'
-        ]
-        
-        # Add potential new features if they exist in the dataframe
-        for feat in potential_new_features:
-            if feat in ml_df.columns:
-                feature_columns.append(feat)
-        
-        # Remove any columns that don't exist in the dataframe
-        feature_columns = [col for col in feature_columns if col in ml_df.columns]
-        
+    def calculate_cohort_retention(self, as_of=None, first_cohort=None, last_cohort=None,
+                                   max_months=None):
+        """
+        Retention matrix of the monthly start cohorts (see churn_cohorts.cohort_retention).
+
+        :param as_of: Observation date (default: today)
+        :param first_cohort: Optional first cohort month (YYYY-MM-DD)
+        :param last_cohort: Optional last cohort month (YYYY-MM-DD)
+        :param max_months: Optional number of months-since-start columns
+        :return: Dict with cohorts, months_since_start, cohort_sizes, active,
+                 retention and observed arrays
+        """
+        self._require_frame("Cohort retention")
+        return cohort_retention(self.df['contract_start_date'], self.df['contract_end_date'],
+                                as_of=as_of, first_cohort=first_cohort, last_cohort=last_cohort,
+                                max_months=max_months)
+
+    def churn_time_series(self, start, end, freq='D', window=None):
+        """
+        Churn rates over a regular date grid, optionally with a rolling window.
+
+        The grid is ``pd.date_range(start, end, freq=freq)`` and each period
+        runs from one grid date to the next (a trailing partial period is not
+        included). Active counts at every grid date and the cumulative number of
+        ended contracts are looked up once in the contract index, so a five-year
+        daily series costs the same as a handful of periods.
+
+        :param start: First grid date (YYYY-MM-DD or datetime-like)
+        :param end: Last grid date
+        :param freq: Pandas frequency of the grid ('D', 'W-MON', 'MS', ...)
+        :param window: Optional number of periods for the rolling churn rate
+        :return: DataFrame with period_start, period_end, customers_at_start,
+                 customers_at_end, churned_customers, churn_rate and, with a window,
+                 rolling_churned_customers and rolling_churn_rate
+        """
+        grid = pd.date_range(start, end, freq=freq)
+        index = self.contract_index
+        active = index.active_count_at(grid)
+        # ended[k] = contracts ended on or before grid[k]
+        ended = index.ended_count_at(grid)
+
+        def rate(churned, at_start):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(at_start > 0, np.round(churned / at_start * 100, 2), 0.0)
+
+        churned = np.diff(ended)
+        series = pd.DataFrame({
+            'period_start': grid[:-1],
+            'period_end': grid[1:],
+            'customers_at_start': active[:-1],
+            'customers_at_end': active[1:],
+            'churned_customers': churned,
+            'churn_rate': rate(churned, active[:-1]),
+        })
+
+        if window is not None:
+            if window < 1:
+                raise ValueError("window must be a positive number of periods")
+            # Churn over the last `window` periods, relative to the customers
+            # active at the start of the first of them
+            first = np.maximum(np.arange(len(churned)) + 1 - window, 0)
+            rolling = ended[1:] - ended[first]
+            rolling_rate = rate(rolling, active[first])
+            incomplete = np.arange(len(churned)) < window - 1
+            series['rolling_churned_customers'] = pd.array(rolling, dtype='Int64')
+            series['rolling_churn_rate'] = rolling_rate
+            series.loc[incomplete, ['rolling_churned_customers', 'rolling_churn_rate']] = pd.NA
+        return series
+
+    def _feature_data(self, fit_encoders=None):
+        """
+        Prepared feature frame, feature list and float32 matrix, cached per dataset.
+
+        The cache is keyed on a content fingerprint of ``self.df`` (see
+        churn_scoring.data_fingerprint), so it is rebuilt when the data changes,
+        even in place, and when the encoders are refitted (or loaded); otherwise
+        training and scoring share the same matrix. Hashing the data costs a
+        fraction of rebuilding the features. Without refitting, the features are those the model was trained
+        on (``self.feature_columns``) when known.
+
+        :param fit_encoders: True to refit the categorical encoders, False to reuse
+                             the fitted ones, None to fit only if none are fitted yet
+        :return: Tuple (ml_df, feature_columns, X)
+        """
+        self._require_frame("Feature preparation")
+        if fit_encoders is None:
+            fit_encoders = not self.label_encoders
+
+        fingerprint = data_fingerprint(self.df)
+        cache = self._feature_cache
+        if (not fit_encoders and cache is not None and cache['fingerprint'] == fingerprint
+                and cache['encoders'] is self.label_encoders
+                and (self.feature_columns is None or cache['feature_columns'] == self.feature_columns)):
+            return cache['ml_df'], cache['feature_columns'], cache['X']
+
+        ml_df = build_feature_frame(self.df)
+        if fit_encoders:
+            self.label_encoders = fit_label_encoders(ml_df)
+        encode_categoricals(ml_df, self.label_encoders)
+        if fit_encoders or self.feature_columns is None:
+            feature_columns = select_feature_columns(ml_df)
+        else:
+            feature_columns = self.feature_columns
+            missing = [col for col in feature_columns if col not in ml_df.columns]
+            if missing:
+                raise ValueError(f"Data is missing model features: {missing}")
+        X = to_feature_matrix(ml_df, feature_columns)
+
+        self._feature_cache = {
+            'fingerprint': fingerprint,
+            'encoders': self.label_encoders,
+            'ml_df': ml_df,
+            'feature_columns': feature_columns,
+            'X': X,
+        }
+        return ml_df, feature_columns, X
+
+    def prepare_ml_data(self, fit_encoders=None):
+        """
+        Prepare data for machine learning model.
+
+        :param fit_encoders: True to refit the categorical encoders, False to reuse
+                             the fitted ones, None to fit only if none are fitted yet
+        :return: Tuple (ml_df, feature_columns)
+        """
+        ml_df, feature_columns, _ = self._feature_data(fit_encoders)
         return ml_df, feature_columns
+
+    def get_feature_matrix(self, fit_encoders=None):
+        """
+        Feature matrix, target and feature names for the loaded dataset.
+
+        :param fit_encoders: See prepare_ml_data
+        :return: Tuple (X, y, feature_columns) with X a C-contiguous float32 array
+        """
+        ml_df, feature_columns, X = self._feature_data(fit_encoders)
+        return X, ml_df['churned'].to_numpy(), feature_columns
     
-    def train_ml_model(self, use_balanced_classes=True, optimize_hyperparameters=False):
+    def write_feature_store(self, directory, test_size=0.2, random_state=42):
+        """
+        Write the prepared features to a memory-mapped store (see churn_feature_store).
+
+        Encoders are fitted on the loaded data, as in train_ml_model. Training
+        and scoring can then read the matrix from disk with
+        train_ml_model(feature_store=...) and predict_churn(feature_store=...)
+        without rebuilding or copying it, including in search worker processes.
+
+        :param directory: Store directory
+        :param test_size: Fraction of rows kept for evaluation
+        :param random_state: Seed of the stratified split
+        :return: Path of the store metadata file
+        """
+        ml_df, feature_columns, X = self._feature_data(fit_encoders=True)
+        path = write_feature_store(
+            directory, X, ml_df['churned'].to_numpy(), ml_df['customer_id'].to_numpy(),
+            ml_df['contract_end_date'].to_numpy(dtype='datetime64[ns]'), feature_columns,
+            self.label_encoders, test_size=test_size, random_state=random_state,
+            fingerprint=self._feature_cache['fingerprint']
+        )
+        print(f"Feature store with {len(X)} rows written to {directory}")
+        return path
+
+    def train_ml_model(self, use_balanced_classes=True, optimize_hyperparameters=False,
+                       search_strategy='grid', search_budget=None, n_candidates=16,
+                       n_jobs=-1, backend='loky', feature_store=None):
         """Train machine learning model to predict churn.
         
         :param use_balanced_classes: If True, uses class weights to handle imbalanced data.
-        :param optimize_hyperparameters: If True, uses GridSearchCV to find best hyperparameters.
+        :param optimize_hyperparameters: If True, searches for the best hyperparameters.
+        :param search_strategy: 'grid' (exhaustive GridSearchCV), 'random' (RandomizedSearchCV
+                                with n_candidates draws) or 'halving' (budgeted successive
+                                halving with warm-started forests, see churn_search.py).
+        :param search_budget: Time budget in seconds for the 'halving' strategy.
+        :param n_candidates: Configurations sampled by the 'random' and 'halving' strategies.
+        :param n_jobs: Parallel jobs used by the search.
+        :param backend: Joblib backend for the search ('loky', 'multiprocessing', 'threading').
+        :param feature_store: Optional directory written by write_feature_store: the
+                              memory-mapped matrix is used instead of the loaded data, and
+                              its training/test rows are contiguous slices (no copies).
         """
-        # Prepare data
-        ml_df, feature_columns = self.prepare_ml_data()
-        
-        # Check if we have the required columns
-        if 'churned' not in ml_df.columns:
-            print("Error: 'churned' column not found in data")
-            return
-        
-        # Prepare features and target
-        X = ml_df[feature_columns]
-        y = ml_df['churned']
-        
-        # Split data into training and testing sets
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
+        from joblib import parallel_backend
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.metrics import classification_report
+        from sklearn.model_selection import train_test_split, GridSearchCV, RandomizedSearchCV
+        from churn_search import RF_PARAM_DISTRIBUTIONS, successive_halving_search
+
+        if feature_store is not None:
+            store = load_feature_store(feature_store)
+            self.label_encoders = store.label_encoders
+            feature_columns = self.feature_columns = store.feature_columns
+            # The store records the fingerprint of the data it was written from
+            self.training_fingerprint = store.metadata['source_fingerprint']
+            X_train, X_test, y_train, y_test = store.train_test()
+        else:
+            # Prepare features and target. The encoders are fitted on all the loaded
+            # rows, before the split: label encoding only maps category names to
+            # integers (no target statistics), and scoring needs every name known
+            X, y, feature_columns = self.get_feature_matrix(fit_encoders=True)
+            self.feature_columns = feature_columns
+            self.training_fingerprint = self._feature_cache['fingerprint']
+            
+            # Split data into training and testing sets
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=0.2, random_state=42, stratify=y
+            )
         
         # Determine class weight
         class_weight = 'balanced' if use_balanced_classes else None
         
-        if optimize_hyperparameters:
-            print("Performing hyperparameter optimization with GridSearchCV...")
+        if optimize_hyperparameters and search_strategy == 'halving':
+            print("Performing budgeted hyperparameter search with successive halving...")
+            self.model, best_params, best_score, _ = successive_halving_search(
+                X_train, y_train,
+                class_weight=class_weight,
+                n_candidates=n_candidates,
+                time_budget=search_budget,
+                n_jobs=n_jobs,
+                backend=backend
+            )
+            
+            print("\nBest Hyperparameters:")
+            for param, value in best_params.items():
+                print(f"  {param}: {value}")
+            print(f"\nBest Validation Score: {best_score:.4f}")
+            
+        elif optimize_hyperparameters:
             # Define the model
             rf = RandomForestClassifier(random_state=42, class_weight=class_weight)
             
-            # Define the hyperparameter grid
-            # Note: A small grid for demonstration. In practice, you might want a larger grid.
-            param_grid = {
-                'n_estimators': [50, 100],
-                'max_depth': [None, 10, 20],
-                'min_samples_split': [2, 5],
-                'min_samples_leaf': [1, 2]
-            }
-            
-            # Create the GridSearchCV object
-            # Using accuracy as the scoring metric, but you can change it (e.g., 'f1', 'precision', 'recall')
-            grid_search = GridSearchCV(
-                estimator=rf, 
-                param_grid=param_grid, 
-                cv=3,  # 3-fold cross-validation
-                scoring='accuracy',
-                n_jobs=-1,  # Use all available cores
-                verbose=1   # Print progress
-            )
+            if search_strategy == 'random':
+                print("Performing hyperparameter optimization with RandomizedSearchCV...")
+                search = RandomizedSearchCV(
+                    estimator=rf,
+                    param_distributions=dict(RF_PARAM_DISTRIBUTIONS, n_estimators=[50, 100, 200]),
+                    n_iter=n_candidates,
+                    cv=3,
+                    scoring='accuracy',
+                    n_jobs=n_jobs,
+                    random_state=42,
+                    verbose=1
+                )
+            elif search_strategy == 'grid':
+                print("Performing hyperparameter optimization with GridSearchCV...")
+                # Define the hyperparameter grid
+                # Note: A small grid for demonstration. In practice, you might want a larger grid.
+                param_grid = {
+                    'n_estimators': [50, 100],
+                    'max_depth': [None, 10, 20],
+                    'min_samples_split': [2, 5],
+                    'min_samples_leaf': [1, 2]
+                }
+                
+                # Create the GridSearchCV object
+                # Using accuracy as the scoring metric, but you can change it (e.g., 'f1', 'precision', 'recall')
+                search = GridSearchCV(
+                    estimator=rf, 
+                    param_grid=param_grid, 
+                    cv=3,  # 3-fold cross-validation
+                    scoring='accuracy',
+                    n_jobs=n_jobs,  # -1 uses all available cores
+                    verbose=1   # Print progress
+                )
+            else:
+                raise ValueError(f"Unknown search_strategy: {search_strategy!r}")
             
-            # Fit the GridSearchCV object to the data
-            grid_search.fit(X_train, y_train)
+            # Fit the search object to the data
+            with parallel_backend(backend):
+                search.fit(X_train, y_train)
             
             # Get the best model
-            self.model = grid_search.best_estimator_
+            self.model = search.best_estimator_
             
             # Print the best parameters
             print("\nBest Hyperparameters:")
-            for param, value in grid_search.best_params_.items():
+            for param, value in search.best_params_.items():
                 print(f"  {param}: {value}")
-            print(f"\nBest Cross-Validation Score: {grid_search.best_score_:.4f}")
+            print(f"\nBest Cross-Validation Score: {search.best_score_:.4f}")
             
         else:
             # Train Random Forest model with default or specified parameters
@@ -326,44 +582,127 @@ class ChurnCalculator:
         
         return self.model
     
-    def predict_churn(self):
-        """Predict which customers are likely to churn."""
+    def predict_churn(self, n_workers=None, feature_store=None):
+        """Predict which customers are likely to churn.
+        
+        :param n_workers: If greater than 1, score on a pool of worker processes,
+                          sharded by customer_id range (see churn_scoring.score_parallel).
+        :param feature_store: Optional directory written by write_feature_store: score
+                              its memory-mapped rows instead of the loaded data.
+        """
+        if feature_store is None:
+            self._require_frame("Scoring")
         if self.model is None:
             print("Model not trained yet. Please train the model first.")
             return None
         
-        # Prepare data
-        ml_df, feature_columns = self.prepare_ml_data()
+        if feature_store is not None:
+            store = load_feature_store(feature_store)
+            if self.feature_columns is not None and store.feature_columns != self.feature_columns:
+                raise ValueError("Feature store columns do not match the model features")
+            # Back to the original row order, so ties rank as with the loaded data
+            original = np.argsort(store.row_order)
+            predictions = self.model.predict_proba(store.X)[:, 1]
+            scored = pd.DataFrame({
+                'customer_id': store.customer_ids[original],
+                'contract_end_date': store.contract_end_dates[original],
+                'churn_probability': predictions[original],
+            })
+            return select_high_risk(scored)
+        
+        if n_workers is not None and n_workers > 1:
+            _, high_risk = score_parallel(self._model_bundle(), self.df, n_workers)
+            return high_risk
+        
+        # Reuse the features (and encoders) prepared at training time
+        ml_df, feature_columns, X = self._feature_data(fit_encoders=False)
         
         # Make predictions for all customers
-        X = ml_df[feature_columns]
         predictions = self.model.predict_proba(X)[:, 1]  # Probability of churning
         
-        # Add predictions to dataframe
-        ml_df['churn_probability'] = predictions
+        # Add predictions to a new frame (the prepared data stays cached untouched)
+        scored = ml_df[['customer_id', 'contract_end_date']].assign(churn_probability=predictions)
+        
+        # Keep high-risk customers whose contract has not ended yet
+        return select_high_risk(scored)
+    
+    def _model_bundle(self):
+        """In-memory model bundle (estimator, encoders, feature columns) for churn_scoring."""
+        return {
+            'estimator': self.model,
+            'label_encoders': self.label_encoders,
+            'feature_columns': self.feature_columns,
+        }
+    
+    def predict_churn_batched(self, batch_size=DEFAULT_BATCH_SIZE, sink=None, top_k=DEFAULT_TOP_K):
+        """
+        Score customers in fixed-size batches read straight from the data file.
+        
+        Unlike predict_churn, the customer table is never materialised as a
+        whole: peak memory depends on batch_size, not on the number of customers.
         
-        # Filter for customers with high probability of churning
-        high_risk_customers = ml_df[ml_df['churn_probability'] > 0.5].sort_values(
-            'churn_probability', ascending=False
+        :param batch_size: Customers per batch
+        :param sink: Optional output file for all scores (.csv or .parquet)
+        :param top_k: Maximum number of high-risk customers returned
+        :return: DataFrame with the top_k high-risk customers, sorted by probability
+        """
+        if self.model is None:
+            print("Model not trained yet. Please train the model first.")
+            return None
+        
+        n_scored, high_risk = score_in_batches(
+            self._model_bundle(), self.data_file, batch_size, sink=sink, top_k=top_k
         )
+        print(f"Scored {n_scored} customers in batches of {batch_size}")
+        return high_risk
+    
+    def save_model(self, path):
+        """
+        Save the trained model as a versioned bundle for scoring-only runs.
         
-        # Exclude customers who have already churned (contract_end_date in the past)
-        # Convert contract_end_date to datetime for comparison
-        high_risk_customers = high_risk_customers.copy() # To avoid SettingWithCopyWarning
-        high_risk_customers['contract_end_date'] = pd.to_datetime(high_risk_customers['contract_end_date'])
+        The bundle holds the estimator, the fitted encoders, the feature columns
+        and a fingerprint of the training data (see churn_scoring.py): the loaded
+        data, or the data the feature store was written from when the model was
+        trained with train_ml_model(feature_store=...).
         
-        # Filter out customers whose contract ended before today
-        today = pd.to_datetime('today')
-        future_risk_customers = high_risk_customers[
-            (high_risk_customers['contract_end_date'].isna()) | 
-            (high_risk_customers['contract_end_date'] > today)
-        ]
+        :param path: Destination file
+        """
+        if self.model is None:
+            print("Model not trained yet. Please train the model first.")
+            return
+        save_model_bundle(
+            path, self.model, self.label_encoders, self.feature_columns,
+            fingerprint=self.training_fingerprint
+        )
+        print(f"Model saved to {path}")
+    
+    def load_model(self, path):
+        """
+        Load a model bundle saved with save_model, replacing the current model.
         
-        # Select and return relevant columns
-        return future_risk_customers[['customer_id', 'churn_probability', 'contract_end_date']]
+        :param path: Bundle file
+        :return: The loaded bundle
+        """
+        bundle = load_model_bundle(path)
+        self.model = bundle['estimator']
+        self.label_encoders = bundle['label_encoders']
+        self.feature_columns = bundle['feature_columns']
+        self.training_fingerprint = bundle.get('training_data_fingerprint')
+        return bundle
     
-    def plot_churn_trends(self, year):
-        """Plot monthly and quarterly churn trends."""
+    def plot_churn_trends(self, year, save_path=None, show=True):
+        """Plot monthly and quarterly churn trends.
+        
+        :param year: Year to plot
+        :param save_path: Optional image file to save the chart to (e.g. churn_2024.png)
+        :param show: If False, do not open a window (use with save_path on servers)
+        """
+        import matplotlib
+        if not show:
+            # Headless: draw off-screen instead of loading a GUI backend
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
         # Calculate monthly churn rates
         monthly_df = self.calculate_monthly_churn_rates(year)
         
@@ -391,21 +730,26 @@ class ChurnCalculator:
         ax2.grid(True, axis='y')
         
         plt.tight_layout()
-        plt.show()
+        if save_path is not None:
+            fig.savefig(save_path)
+            print(f"Chart saved to {save_path}")
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
         
         return monthly_df, quarterly_df
 
-def main():
-    """Main function to run the churn calculator."""
+def _interactive_main(argv):
+    """Original interactive run: rates, grid search, scoring and plots in sequence."""
     print("Churn Rate Calculator with Machine Learning")
     print("=" * 50)
     
     # Get CSV file path from command line arguments or user input
-    import sys
     import datetime
     
-    if len(sys.argv) > 1:
-        csv_file_path = sys.argv[1]
+    if len(argv) > 0:
+        csv_file_path = argv[0]
     else:
         # Get CSV file path from user
         csv_file_path = input("Enter the path to your customer data CSV file: ").strip()
@@ -413,13 +757,10 @@ def main():
     # Initialize churn calculator
     calculator = ChurnCalculator(csv_file_path)
     
-    if calculator.df is None:
-        return
-    
     # Get year for analysis from command line arguments or user input
-    if len(sys.argv) > 2:
+    if len(argv) > 1:
         try:
-            year = int(sys.argv[2])
+            year = int(argv[1])
         except ValueError:
             print("Invalid year in command line argument. Using current year.")
             year = datetime.datetime.now().year
@@ -461,5 +802,202 @@ def main():
     print("\nGenerating churn trend plots...")
     calculator.plot_churn_trends(year)
 
+
+# Subcommands of the batch command line (anything else runs the interactive mode)
+COMMANDS = ('rates', 'train', 'score', 'plot', 'benchmark')
+OUTPUT_FORMATS = ('table', 'csv', 'json')
+# --period of the rates subcommand -> rollup grain
+RATE_PERIODS = {'monthly': 'month', 'quarterly': 'quarter', 'half-yearly': 'half', 'yearly': 'year'}
+
+
+def _write_table(df, output=None, fmt='table'):
+    """Print a result table or write it to a file in the requested format."""
+    if fmt == 'csv':
+        text = df.to_csv(index=False)
+    elif fmt == 'json':
+        text = df.to_json(orient='records', date_format='iso', indent=2)
+    else:
+        text = df.to_string(index=False) + '\n'
+    if output is None:
+        print(text, end='')
+    else:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"Results written to {output}", file=sys.stderr)
+
+
+def _build_parser():
+    """Argument parser of the batch command line."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Churn rate calculator with machine learning (batch mode). "
+                    "Without a subcommand the original interactive mode runs: "
+                    "churn_calculator_ml.py [csv_file] [year]."
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub, output=True):
+        sub.add_argument('input', nargs='+',
+                         help="Customer data CSV file, or several files / a directory / a glob "
+                              "pattern of partitions (loaded in parallel)")
+        sub.add_argument('--no-cache', action='store_true', help="Do not use the Parquet cache")
+        sub.add_argument('--metrics',
+                         help="Write stage timings, rows and memory to this file "
+                              "(Prometheus text for .prom, JSON lines otherwise)")
+        sub.add_argument('--trace-memory', action='store_true',
+                         help="Also measure the allocation peak of every stage (tracemalloc)")
+        sub.add_argument('--validate', choices=VALIDATION_MODES,
+                         help="Validate the input: 'raise' rejects the input if any row is invalid, "
+                              "'quarantine' drops the invalid rows")
+        sub.add_argument('--quarantine-file', help="CSV file for the rows dropped by --validate quarantine")
+        if output:
+            sub.add_argument('--output', help="Output file (default: standard output)")
+            sub.add_argument('--format', choices=OUTPUT_FORMATS, default='table',
+                             help="Output format")
+
+    rates = commands.add_parser('rates', help="Monthly, quarterly, half-yearly or yearly churn rates")
+    add_common(rates)
+    rates.add_argument('--year', type=int, default=datetime.now().year, help="Year of analysis")
+    rates.add_argument('--period', choices=list(RATE_PERIODS), default='monthly')
+    rates.add_argument('--by', nargs='+', help="Segment columns (e.g. service_type contract_type)")
+    plot = commands.add_parser('plot', help="Plot monthly and quarterly churn trends")
+    for sub in (rates, plot):
+        sub.add_argument('--backend', choices=BACKENDS, default='pandas',
+                         help="'sqlite' computes the rates in an SQLite file (larger-than-memory data)")
+        sub.add_argument('--database', help="SQLite file of the sqlite backend (default: <input>.sqlite)")
+
+    train = commands.add_parser('train', help="Train the churn model and save it")
+    add_common(train, output=False)
+    train.add_argument('--model', default='churn_model.joblib', help="Model bundle to write")
+    train.add_argument('--search', choices=['none', 'grid', 'random', 'halving'], default='none',
+                       help="Hyperparameter search (default: none, fixed parameters)")
+    train.add_argument('--search-budget', type=float, help="Time budget in seconds for 'halving'")
+    train.add_argument('--candidates', type=int, default=16, help="Configurations for 'random'/'halving'")
+    train.add_argument('--jobs', type=int, default=-1, help="Parallel jobs of the search")
+    train.add_argument('--backend', choices=['loky', 'multiprocessing', 'threading'], default='loky')
+    train.add_argument('--no-balanced', action='store_true', help="Do not use balanced class weights")
+    train.add_argument('--feature-store', help="Train from a memory-mapped feature store directory "
+                            "(the input data is then not loaded)")
+
+    score = commands.add_parser('score', help="Score customers with a saved model")
+    add_common(score)
+    score.add_argument('--model', default='churn_model.joblib', help="Model bundle to load")
+    score.add_argument('--jobs', type=int, help="Worker processes (sharded by customer_id)")
+    score.add_argument('--batch-size', type=int,
+                       help="Score the file in batches of this many customers (constant memory)")
+
+    add_common(plot, output=False)
+    plot.add_argument('--year', type=int, default=datetime.now().year, help="Year to plot")
+    plot.add_argument('--save-plot', help="Image file to save the chart to")
+    plot.add_argument('--no-show', action='store_true', help="Do not open a window (Agg backend)")
+
+    # Handled in main: all arguments go to benchmark_churn_pipeline.main
+    commands.add_parser('benchmark', help="Run benchmark_churn_pipeline.py with the remaining arguments")
+    return parser
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+
+    With a subcommand (rates, train, score, plot, benchmark) each stage runs
+    alone and never prompts; otherwise the original interactive mode runs.
+
+    :param argv: Arguments (default: sys.argv[1:])
+    :return: Exit status
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    try:
+        if not argv or (argv[0] not in COMMANDS and not argv[0].startswith('-')):
+            _interactive_main(argv)
+            return 0
+
+        if argv[0] == 'benchmark':
+            # Options are passed through untouched to the benchmark's own parser
+            import benchmark_churn_pipeline
+            return benchmark_churn_pipeline.main(argv[1:])
+
+        args = _build_parser().parse_args(argv)
+        if len(args.input) == 1:
+            args.input = args.input[0]
+        metrics = None
+        if args.metrics:
+            from churn_metrics import StageMetrics
+            metrics = StageMetrics(trace_memory=args.trace_memory, labels={'command': args.command})
+        try:
+            return _run_command(args, metrics)
+        finally:
+            if metrics is not None:
+                metrics.write(args.metrics)
+    except ValidationError as e:
+        print(f"Invalid input: {e}", file=sys.stderr)
+        return 2
+    except (ValueError, OSError, sqlite3.Error) as e:
+        # Bad input, missing files, unreadable databases: an error message and status 2
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+def _run_command(args, metrics=None):
+    """Run one batch subcommand (see main)."""
+    if args.command == 'score' and args.batch_size:
+        if args.validate:
+            # Duplicate ids can only be found on the whole file
+            print("--validate is not supported with --batch-size", file=sys.stderr)
+            return 2
+        # Constant memory: the file is read in batches, never loaded as a whole
+        with metrics.stage('score_in_batches') if metrics else contextlib.nullcontext({}) as record:
+            n_scored, high_risk = score_in_batches(load_model_bundle(args.model), args.input,
+                                                   args.batch_size)
+            record['rows'] = n_scored
+        print(f"Scored {n_scored} customers in batches of {args.batch_size}", file=sys.stderr)
+        _write_table(high_risk, args.output, args.format)
+        return 0
+
+    columns = None
+    storage = {}
+    if args.command in ('rates', 'plot'):
+        if not getattr(args, 'by', None):
+            from customer_store import RATE_COLUMNS
+            columns = RATE_COLUMNS
+        # train has its own --backend (the joblib backend of the search)
+        storage = {'backend': args.backend, 'database': args.database}
+    # Training from a feature store does not read the input data at all
+    load = not (args.command == 'train' and args.feature_store)
+    calculator = ChurnCalculator(args.input, columns=columns, use_cache=not args.no_cache,
+                                 metrics=metrics, validation=args.validate, load=load, **storage)
+    if calculator.quarantined is not None and args.quarantine_file:
+        calculator.quarantined.to_csv(args.quarantine_file, index_label='row')
+        print(f"Quarantined rows written to {args.quarantine_file}", file=sys.stderr)
+
+    if args.command == 'rates':
+        rates = calculator.calculate_rollup_churn_rates(args.year, RATE_PERIODS[args.period],
+                                                        by=args.by)
+        _write_table(rates, args.output, args.format)
+
+    elif args.command == 'train':
+        calculator.train_ml_model(
+            use_balanced_classes=not args.no_balanced,
+            optimize_hyperparameters=args.search != 'none',
+            search_strategy='grid' if args.search == 'none' else args.search,
+            search_budget=args.search_budget,
+            n_candidates=args.candidates,
+            n_jobs=args.jobs,
+            backend=args.backend,
+            feature_store=args.feature_store
+        )
+        calculator.save_model(args.model)
+
+    elif args.command == 'score':
+        calculator.load_model(args.model)
+        high_risk = calculator.predict_churn(n_workers=args.jobs)
+        _write_table(high_risk, args.output, args.format)
+
+    elif args.command == 'plot':
+        calculator.plot_churn_trends(args.year, save_path=args.save_plot, show=not args.no_show)
+
+    return 0
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
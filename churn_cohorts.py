@@ -0,0 +1,114 @@
+"""
+Cohort retention for the churn calculators.
+
+Customers are grouped by the calendar month of their contract start
+(cohort c) and followed month by month: a customer of cohort c is retained
+after k months when the contract is still active on the first day of month
+c + k + 1, i.e. after the start month and k further months.
+
+With q the first month start on or after the (effective) contract end, a
+contract is active on the first day of month m exactly when m < q, so the
+customer is retained for every k < L with L = q - c - 1 (open contracts: L is
+unbounded). The whole matrix is therefore one 2-D histogram of (c, L)
+followed by a reverse cumulative sum over L, instead of one period query per
+cell.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _month_number(dates):
+    """Calendar month of each date as months since 1970-01."""
+    return dates.astype('datetime64[M]').astype(np.int64)
+
+
+def cohort_retention(start_dates, end_dates, as_of=None, first_cohort=None, last_cohort=None,
+                     max_months=None):
+    """
+    Cohort x months-since-start retention matrix.
+
+    :param start_dates: Array-like of contract start dates (rows without one are ignored)
+    :param end_dates: Array-like of contract end dates (missing = still active)
+    :param as_of: Observation date (default: today); cells whose month has not
+                  ended by this date are not observed
+    :param first_cohort: Optional first cohort month (date-like)
+    :param last_cohort: Optional last cohort month (date-like)
+    :param max_months: Optional number of months-since-start columns
+    :return: Dict with
+             - cohorts: datetime64[M] array of cohort months (rows)
+             - months_since_start: int array 0..K-1 (columns)
+             - cohort_sizes: customers per cohort
+             - active: (cohorts, K) int64 array of retained customers
+             - retention: (cohorts, K) float array active / cohort_sizes, NaN where not observed
+             - observed: (cohorts, K) bool array, True where the month has ended by as_of
+    """
+    start = pd.to_datetime(pd.Series(start_dates)).to_numpy(dtype='datetime64[ns]')
+    end = pd.to_datetime(pd.Series(end_dates)).to_numpy(dtype='datetime64[ns]')
+    as_of = pd.Timestamp('today' if as_of is None else as_of).to_datetime64().astype('datetime64[ns]')
+
+    keep = ~np.isnat(start)
+    start, end = start[keep], end[keep]
+    cohort = _month_number(start)
+
+    if first_cohort is not None:
+        first = int(_month_number(pd.Timestamp(first_cohort).to_datetime64()))
+    else:
+        first = int(cohort.min()) if len(cohort) else 0
+    if last_cohort is not None:
+        last = int(_month_number(pd.Timestamp(last_cohort).to_datetime64()))
+    else:
+        last = int(cohort.max()) if len(cohort) else first - 1
+    in_range = (cohort >= first) & (cohort <= last)
+    start, end, cohort = start[in_range], end[in_range], cohort[in_range] - first
+    n_cohorts = max(last - first + 1, 0)
+
+    # The last month boundary on or before as_of closes the last observed month
+    horizon = int(_month_number(as_of)) - first
+    if max_months is None:
+        max_months = max(horizon, 0) if n_cohorts else 0
+    n_months = max_months
+
+    # L = q - c - 1, with q the first month start on or after the effective end
+    has_end = ~np.isnat(end)
+    effective_end = np.maximum(start[has_end], end[has_end])
+    months = effective_end.astype('datetime64[M]')
+    q = months.astype(np.int64) + (effective_end > months.astype('datetime64[ns]')) - first
+    lifetime = np.full(len(start), n_months, dtype=np.int64)
+    lifetime[has_end] = np.clip(q - cohort[has_end] - 1, 0, n_months)
+
+    # histogram[c, l] = customers of cohort c retained for exactly l months (l = K: all of them)
+    width = n_months + 1
+    histogram = np.bincount(cohort * width + lifetime, minlength=n_cohorts * width).reshape(n_cohorts, width)
+    cohort_sizes = histogram.sum(axis=1)
+    # active[c, k] = customers with lifetime > k
+    active = cohort_sizes[:, None] - np.cumsum(histogram, axis=1)[:, :n_months]
+
+    # Month k of cohort c has ended once the first day of month c + k + 1 is <= as_of
+    observed = (np.arange(n_cohorts)[:, None] + np.arange(n_months)[None, :] + 1) <= horizon
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention = np.where(observed & (cohort_sizes[:, None] > 0),
+                             active / cohort_sizes[:, None], np.nan)
+
+    return {
+        'cohorts': (np.arange(first, first + n_cohorts)).astype('datetime64[M]'),
+        'months_since_start': np.arange(n_months),
+        'cohort_sizes': cohort_sizes,
+        'active': np.where(observed, active, 0),
+        'retention': retention,
+        'observed': observed,
+    }
+
+
+def retention_frame(matrix):
+    """
+    Retention matrix as a DataFrame (cohort labels x months since start).
+
+    :param matrix: Dict returned by cohort_retention
+    :return: DataFrame indexed by cohort month ('YYYY-MM'), one column per month since start
+    """
+    return pd.DataFrame(
+        matrix['retention'],
+        index=pd.Index(matrix['cohorts'].astype(str), name='cohort'),
+        columns=pd.Index(matrix['months_since_start'], name='months_since_start'),
+    )
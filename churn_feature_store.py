@@ -0,0 +1,156 @@
+"""
+On-disk, memory-mapped feature store for training and scoring.
+
+The prepared feature matrix (float32, C-contiguous) and the target are saved
+as .npy files in a directory and opened with numpy memory-mapping, so the data
+lives in the OS page cache instead of being copied in every process:
+- rows are written in the order of the stratified train/test split
+  (training rows first), so X_train and X_test are contiguous slices of the
+  same file and slicing them copies nothing;
+- joblib passes memory-mapped arrays to its worker processes by file
+  reference instead of pickling them, so GridSearchCV(n_jobs=-1) and
+  RandomizedSearchCV workers share a single copy of X.
+
+Layout of a store directory:
+    X.npy                  float32 (n_rows, n_features)
+    y.npy                  bool (n_rows,)
+    customer_id.npy        customer ids
+    contract_end_date.npy  datetime64[ns] contract end dates (NaT = active)
+    row_order.npy          original row position of every stored row
+    label_encoders.joblib  encoders fitted when the store was written
+    metadata.json          feature columns, split sizes and provenance
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+FEATURE_STORE_VERSION = 1
+METADATA_FILE = 'metadata.json'
+_CHUNK_ROWS = 100_000
+
+
+def _write_rows(path, values, order):
+    """Write values[order] to a .npy file chunk by chunk (no full reordered copy)."""
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=values.dtype,
+                                    shape=(len(order),) + values.shape[1:])
+    for first in range(0, len(order), _CHUNK_ROWS):
+        rows = order[first:first + _CHUNK_ROWS]
+        out[first:first + len(rows)] = values[rows]
+    out.flush()
+    del out
+
+
+def write_feature_store(directory, X, y, customer_ids, contract_end_dates, feature_columns,
+                        label_encoders, test_size=0.2, random_state=42, fingerprint=None):
+    """
+    Save a prepared feature matrix as a memory-mappable store.
+
+    The rows are split with the same stratified train_test_split used by
+    ChurnCalculator.train_ml_model (same test_size and random_state), so a
+    model trained on the store sees exactly the same training rows.
+
+    :param directory: Store directory (created if needed)
+    :param X: 2-D float32 feature matrix
+    :param y: Target array
+    :param customer_ids: Customer id of each row
+    :param contract_end_dates: Contract end date of each row
+    :param feature_columns: Names of the columns of X
+    :param label_encoders: Fitted categorical encoders used to build X
+    :param test_size: Fraction of rows in the test slice
+    :param random_state: Seed of the split
+    :param fingerprint: Optional fingerprint of the source data
+    :return: Path of the metadata file
+    """
+    import joblib
+    from sklearn.model_selection import train_test_split
+
+    os.makedirs(directory, exist_ok=True)
+    positions = np.arange(len(y))
+    train_rows, test_rows = train_test_split(
+        positions, test_size=test_size, random_state=random_state, stratify=y
+    )
+    order = np.concatenate([train_rows, test_rows])
+
+    _write_rows(os.path.join(directory, 'X.npy'), np.ascontiguousarray(X, dtype=np.float32), order)
+    np.save(os.path.join(directory, 'y.npy'), np.asarray(y, dtype=bool)[order])
+    np.save(os.path.join(directory, 'customer_id.npy'), np.asarray(customer_ids)[order])
+    np.save(os.path.join(directory, 'contract_end_date.npy'),
+            np.asarray(contract_end_dates, dtype='datetime64[ns]')[order])
+    np.save(os.path.join(directory, 'row_order.npy'), order)
+    joblib.dump(label_encoders, os.path.join(directory, 'label_encoders.joblib'))
+
+    metadata = {
+        'format_version': FEATURE_STORE_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'feature_columns': list(feature_columns),
+        'n_rows': int(len(order)),
+        'n_train': int(len(train_rows)),
+        'test_size': test_size,
+        'random_state': random_state,
+        'source_fingerprint': fingerprint,
+    }
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    with open(metadata_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    return metadata_path
+
+
+class FeatureStore:
+    """Memory-mapped view of a feature store directory."""
+
+    def __init__(self, directory, mmap_mode='c'):
+        """
+        Open a store written by write_feature_store.
+
+        :param directory: Store directory
+        :param mmap_mode: numpy mmap_mode for X and y. The default 'c' (copy-on-write)
+                          shares the pages like 'r' but gives writable arrays, which some
+                          scikit-learn input checks require; the file is never modified.
+        """
+        import joblib
+
+        with open(os.path.join(directory, METADATA_FILE), encoding='utf-8') as f:
+            self.metadata = json.load(f)
+        if self.metadata.get('format_version') != FEATURE_STORE_VERSION:
+            raise ValueError(
+                f"Unsupported feature store version {self.metadata.get('format_version')!r} "
+                f"(expected {FEATURE_STORE_VERSION})"
+            )
+        self.directory = directory
+        self.X = np.load(os.path.join(directory, 'X.npy'), mmap_mode=mmap_mode)
+        self.y = np.load(os.path.join(directory, 'y.npy'), mmap_mode=mmap_mode)
+        self.customer_ids = np.load(os.path.join(directory, 'customer_id.npy'))
+        self.contract_end_dates = np.load(os.path.join(directory, 'contract_end_date.npy'))
+        self.row_order = np.load(os.path.join(directory, 'row_order.npy'))
+        self.label_encoders = joblib.load(os.path.join(directory, 'label_encoders.joblib'))
+
+    @property
+    def feature_columns(self):
+        return self.metadata['feature_columns']
+
+    @property
+    def n_train(self):
+        return self.metadata['n_train']
+
+    def train_test(self):
+        """
+        Training and test slices of the store (views on the memory map, no copy).
+
+        :return: Tuple (X_train, X_test, y_train, y_test)
+        """
+        n_train = self.n_train
+        return self.X[:n_train], self.X[n_train:], self.y[:n_train], self.y[n_train:]
+
+
+def load_feature_store(directory, mmap_mode='c'):
+    """
+    Open a feature store directory.
+
+    :param directory: Store directory
+    :param mmap_mode: numpy mmap_mode for X and y
+    :return: FeatureStore
+    """
+    return FeatureStore(directory, mmap_mode=mmap_mode)
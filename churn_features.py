@@ -0,0 +1,186 @@
+"""
+Feature engineering for the churn prediction model.
+
+The feature pipeline is split in a fit step (learning the categorical
+encodings on the training data) and a transform step (applying the fitted
+encodings), so that scoring always uses exactly the encodings the model was
+trained with. Only pandas/numpy are needed to transform data; scikit-learn is
+imported when encoders are fitted.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Categorical columns that might be in the advanced dataset
+CATEGORICAL_COLUMNS = [
+    'payment_method', 'service_type', 'contract_type',
+    'billing_method', 'customer_tenure_type'  # 'customer_age_group' if added
+]
+
+# Placeholder used for missing categorical values
+UNKNOWN_CATEGORY = 'Unknown'
+
+BASE_FEATURES = [
+    'monthly_charges', 'total_charges', 'tenure_months',
+    'tenure_days', 'avg_monthly_charge', 'days_since_last_interaction',
+    'payment_method_encoded', 'service_type_encoded',
+    'contract_type_encoded'
+]
+
+# Features from the enriched/advanced datasets, used when present
+OPTIONAL_FEATURES = [
+    'avg_monthly_consumption_kwh',
+    'num_support_contacts_last_year',
+    # --- Nuove features avanzate ---
+    'consumption_volatility',
+    'consumption_trend',
+    'consumption_vs_local_avg_ratio',
+    'peak_hour_consumption_ratio',
+    'smart_meter_flag',
+    'has_promo',
+    'days_since_last_promo_end',
+    'num_price_changes_last_year',
+    'last_bill_amount_vs_avg',
+    'num_late_payments',
+    'avg_days_late_payment',
+    'billing_method_encoded',
+    'contract_renewal_reminder_sent',
+    'days_to_contract_end',
+    'has_online_account',
+    'num_logins_last_month',
+    'num_paperless_bills_sent',
+    'last_survey_satisfaction_score',
+    'num_complaints_last_year',  # Subset of support contacts
+    'complaint_resolution_time_avg',
+    # Demographic/Location (if available)
+    # 'customer_age_group_encoded',
+    # 'customer_tenure_type_encoded',
+    # 'urban_rural_flag',
+    # 'postal_code_energy_competition_index'
+]
+
+
+def build_feature_frame(df, reference_date=None):
+    """
+    Add the target and the derived numeric features to a customer DataFrame.
+
+    The input is not modified; the returned frame shares the unchanged columns
+    with it instead of copying them.
+
+    :param df: Customer DataFrame (typed or raw)
+    :param reference_date: Date used as "today" for tenure calculations (default: today)
+    :return: DataFrame with 'churned', 'tenure_days', 'avg_monthly_charge'
+             and 'days_since_last_interaction' columns
+    """
+    reference_date = pd.to_datetime('today') if reference_date is None else pd.to_datetime(reference_date)
+    ml_df = df.copy(deep=False)
+
+    # Create target variable (churned or not)
+    # A customer is considered churned if they have an end date
+    ml_df['churned'] = ~ml_df['contract_end_date'].isna()
+
+    # Data preparation (no-op when the data comes from the typed loader)
+    ml_df['contract_start_date'] = pd.to_datetime(ml_df['contract_start_date'])
+    ml_df['contract_end_date'] = pd.to_datetime(ml_df['contract_end_date'])
+
+    # 1. Calculate tenure in days
+    # For active customers, use the reference date as end date for tenure calculation
+    ml_df['tenure_days'] = (
+        ml_df['contract_end_date'].fillna(reference_date) -
+        ml_df['contract_start_date']
+    ).dt.days
+
+    # 2. Calculate average monthly charge
+    # Avoid division by zero
+    tenure_months = ml_df['tenure_months'].to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ml_df['avg_monthly_charge'] = np.where(
+            tenure_months > 0,
+            ml_df['total_charges'].to_numpy(dtype=np.float64, na_value=np.nan) / tenure_months,
+            ml_df['monthly_charges'].to_numpy(dtype=np.float64, na_value=np.nan)
+        )
+
+    # 3. Calculate days since last interaction (proxy: days since contract start)
+    ml_df['days_since_last_interaction'] = (
+        reference_date - ml_df['contract_start_date']
+    ).dt.days
+
+    return ml_df
+
+
+def _as_category(series):
+    """Categorical view of a column with missing values mapped to UNKNOWN_CATEGORY."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.astype(object).fillna(UNKNOWN_CATEGORY).astype(str).astype('category')
+
+
+def fit_label_encoders(ml_df):
+    """
+    Fit one LabelEncoder per categorical column present in the data.
+
+    Encoders are fitted on the distinct values only, which gives the same
+    classes as fitting on every row.
+
+    :param ml_df: DataFrame with the categorical columns
+    :return: Dict column -> fitted LabelEncoder
+    """
+    from sklearn.preprocessing import LabelEncoder
+
+    encoders = {}
+    for col in CATEGORICAL_COLUMNS:
+        if col in ml_df.columns:
+            values = _as_category(ml_df[col])
+            classes = [str(v) for v in values.dropna().unique()]
+            if values.isna().any():
+                classes.append(UNKNOWN_CATEGORY)
+            encoders[col] = LabelEncoder().fit(classes)
+    return encoders
+
+
+def encode_categoricals(ml_df, encoders):
+    """
+    Add '<col>_encoded' columns using already fitted encoders.
+
+    Values not seen at fit time are encoded as -1.
+
+    :param ml_df: DataFrame with the categorical columns (modified in place)
+    :param encoders: Dict column -> fitted LabelEncoder
+    :return: The same DataFrame
+    """
+    for col, le in encoders.items():
+        if col not in ml_df.columns:
+            continue
+        values = _as_category(ml_df[col])
+        lookup = pd.Index(le.classes_).get_indexer(values.cat.categories.astype(str))
+        # Missing values have code -1, which picks the last entry of the lookup
+        unknown = pd.Index(le.classes_).get_indexer([UNKNOWN_CATEGORY])[0]
+        lookup = np.append(lookup, unknown)
+        ml_df[col + '_encoded'] = lookup[values.cat.codes.to_numpy()]
+    return ml_df
+
+
+def select_feature_columns(ml_df):
+    """
+    List the model features available in a prepared DataFrame.
+
+    :param ml_df: DataFrame returned by build_feature_frame/encode_categoricals
+    :return: List of feature column names
+    """
+    feature_columns = BASE_FEATURES + [feat for feat in OPTIONAL_FEATURES if feat in ml_df.columns]
+    return [col for col in feature_columns if col in ml_df.columns]
+
+
+def to_feature_matrix(ml_df, feature_columns):
+    """
+    Materialise the features as a C-contiguous float32 NumPy matrix.
+
+    :param ml_df: Prepared DataFrame
+    :param feature_columns: Columns to include, in order
+    :return: 2-D float32 array
+    """
+    matrix = np.empty((len(ml_df), len(feature_columns)), dtype=np.float32)
+    for j, col in enumerate(feature_columns):
+        matrix[:, j] = ml_df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+    return matrix
@@ -0,0 +1,358 @@
+"""
+Incremental churn metrics maintained from contract delta files.
+
+The batch engine in ChurnCalculator recomputes the counts from the whole
+customer file. IncrementalChurnStore instead keeps, in a small SQLite
+database, the contract dates of every customer and three counters per
+calendar month:
+- starts: contracts that become active on or before the first day of the month
+  (and after the first day of the previous month);
+- effective_ends: the same for the end of the active interval;
+- ends: contract end dates falling in the same window.
+
+The active customers at a month boundary and the churned customers between two
+boundaries are prefix sums of these counters, so the monthly and quarterly
+tables are identical to the batch ones as long as every customer_id appears
+once: the store keeps one contract per id, so a snapshot with repeated ids
+keeps the last row of each and skips rows without an id, where the batch
+engine counts every row. A delta file only touches the
+counters of the contracts it contains: applying it costs O(changes), and the
+tables are then read from the (few hundred) monthly buckets.
+
+Delta files are CSV files (or DataFrames) keyed by customer_id:
+- contract_start_date / contract_end_date, when the column is present, replace
+  the stored value (an empty value clears it); absent columns keep the stored
+  values, so a file of ended contracts only needs customer_id and
+  contract_end_date;
+- an optional 'action' column with value 'delete' removes the customer.
+When a customer appears more than once in a delta, the last row wins.
+
+Usage:
+    python churn_incremental.py churn_state.db init customer_data.csv
+    python churn_incremental.py churn_state.db apply delta_2025-01-02.csv
+    python churn_incremental.py churn_state.db monthly 2024
+"""
+
+import argparse
+import sqlite3
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from customer_store import RATE_COLUMNS, read_customer_csv
+from churn_periods import month_periods, quarter_periods, parse_periods, period_results
+
+DELETE_ACTION = 'delete'
+
+# datetime64[ns] NaT as stored in an int64 view
+_NAT = np.iinfo(np.int64).min
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    customer_id INTEGER PRIMARY KEY,
+    start_ns INTEGER,
+    end_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS month_counts (
+    bucket INTEGER PRIMARY KEY,
+    starts INTEGER NOT NULL DEFAULT 0,
+    effective_ends INTEGER NOT NULL DEFAULT 0,
+    ends INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS delta_log (
+    applied_at TEXT NOT NULL,
+    source TEXT,
+    inserted INTEGER NOT NULL,
+    updated INTEGER NOT NULL,
+    deleted INTEGER NOT NULL
+);
+"""
+
+
+def month_bucket(dates):
+    """
+    Month bucket of each date: the first month start on or after the date.
+
+    A date d is on or before a month start t exactly when
+    month_bucket(d) <= month_bucket(t), which is what makes the counters
+    exact for month boundaries.
+
+    :param dates: datetime64[ns] array without NaT values
+    :return: int64 array of months since 1970-01
+    """
+    months = dates.astype('datetime64[M]')
+    return months.astype(np.int64) + (dates > months.astype('datetime64[ns]'))
+
+
+def _contributions(start, end):
+    """
+    Counter increments of a set of contracts.
+
+    :param start: datetime64[ns] start dates (NaT allowed)
+    :param end: datetime64[ns] end dates (NaT allowed)
+    :return: DataFrame with columns bucket, starts, effective_ends, ends (one row per event)
+    """
+    has_start = ~np.isnat(start)
+    has_end = ~np.isnat(end)
+    both = has_start & has_end
+    parts = [
+        (month_bucket(start[has_start]), 'starts'),
+        # An end date before the start is clamped so that the contract is never active
+        (month_bucket(np.maximum(start[both], end[both])), 'effective_ends'),
+        (month_bucket(end[has_end]), 'ends'),
+    ]
+    frames = []
+    for buckets, counter in parts:
+        frame = pd.DataFrame({'bucket': buckets, 'starts': 0, 'effective_ends': 0, 'ends': 0})
+        frame[counter] = 1
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _to_sql_values(dates):
+    """datetime64[ns] array -> list of int nanoseconds / None."""
+    values = dates.view(np.int64).astype(object)
+    values[np.isnat(dates)] = None
+    return values.tolist()
+
+
+def _from_sql_values(values):
+    """List of int nanoseconds / None -> datetime64[ns] array."""
+    return np.array([_NAT if v is None else v for v in values], dtype=np.int64).view('datetime64[ns]')
+
+
+class IncrementalChurnStore:
+    """Persistent monthly churn counters updated from contract deltas."""
+
+    def __init__(self, path):
+        """
+        Open (or create) the state database.
+
+        :param path: Path of the SQLite file (':memory:' for a throwaway store)
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_delta(self, source):
+        """Typed delta frame, one row per customer_id (last occurrence wins)."""
+        if isinstance(source, pd.DataFrame):
+            delta = source
+        else:
+            delta = read_customer_csv(source, columns=RATE_COLUMNS + ['action'])
+        if 'customer_id' not in delta.columns:
+            raise ValueError("Delta has no 'customer_id' column")
+        # Rows without an id cannot be matched to a stored contract
+        delta = delta[delta['customer_id'].notna()]
+        return delta.drop_duplicates('customer_id', keep='last').reset_index(drop=True)
+
+    def _stored_contracts(self, customer_ids):
+        """Stored (start, end) of the given customers, aligned with customer_ids."""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS delta_ids (customer_id INTEGER PRIMARY KEY)")
+        self.conn.execute("DELETE FROM delta_ids")
+        self.conn.executemany("INSERT INTO delta_ids VALUES (?)", ((i,) for i in customer_ids))
+        rows = self.conn.execute(
+            "SELECT c.customer_id, c.start_ns, c.end_ns FROM contracts c "
+            "JOIN delta_ids d ON c.customer_id = d.customer_id"
+        ).fetchall()
+        position = pd.Index(customer_ids).get_indexer([row[0] for row in rows])
+        exists = np.zeros(len(customer_ids), dtype=bool)
+        exists[position] = True
+        start = np.full(len(customer_ids), np.datetime64('NaT'), dtype='datetime64[ns]')
+        end = start.copy()
+        start[position] = _from_sql_values([row[1] for row in rows])
+        end[position] = _from_sql_values([row[2] for row in rows])
+        return exists, start, end
+
+    def apply_delta(self, source, source_name=None):
+        """
+        Apply a delta file to the stored contracts and counters.
+
+        :param source: Path of a delta CSV file or a DataFrame
+        :param source_name: Name recorded in delta_log (defaults to the path)
+        :return: Dict with the number of inserted, updated and deleted customers
+        """
+        delta = self._read_delta(source)
+        with self.conn:
+            return self._apply(delta, source, source_name)
+
+    def _apply(self, delta, source, source_name):
+        """Apply a parsed delta inside the caller's transaction."""
+        customer_ids = delta['customer_id'].astype(np.int64).tolist()
+        exists, old_start, old_end = self._stored_contracts(customer_ids)
+
+        new_start, new_end = old_start.copy(), old_end.copy()
+        if 'contract_start_date' in delta.columns:
+            new_start = pd.to_datetime(delta['contract_start_date']).to_numpy(dtype='datetime64[ns]')
+        if 'contract_end_date' in delta.columns:
+            new_end = pd.to_datetime(delta['contract_end_date']).to_numpy(dtype='datetime64[ns]')
+        if 'action' in delta.columns:
+            deleted = (delta['action'].astype(str).str.lower() == DELETE_ACTION).to_numpy()
+        else:
+            deleted = np.zeros(len(delta), dtype=bool)
+        new_start[deleted] = np.datetime64('NaT')
+        new_end[deleted] = np.datetime64('NaT')
+
+        # Remove the old contribution of each touched contract and add the new one
+        removed = _contributions(old_start[exists], old_end[exists])
+        added = _contributions(new_start[~deleted], new_end[~deleted])
+        changes = pd.concat([
+            added, removed.assign(**{c: -removed[c] for c in ('starts', 'effective_ends', 'ends')})
+        ]).groupby('bucket').sum()
+        self.conn.executemany(
+            "INSERT INTO month_counts (bucket, starts, effective_ends, ends) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(bucket) DO UPDATE SET starts = starts + excluded.starts, "
+            "effective_ends = effective_ends + excluded.effective_ends, ends = ends + excluded.ends",
+            [(int(b), int(s), int(e), int(n)) for b, s, e, n in changes.itertuples()]
+        )
+
+        ids = np.asarray(customer_ids, dtype=object)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO contracts (customer_id, start_ns, end_ns) VALUES (?, ?, ?)",
+            zip(ids[~deleted].tolist(), _to_sql_values(new_start[~deleted]),
+                _to_sql_values(new_end[~deleted]))
+        )
+        self.conn.executemany("DELETE FROM contracts WHERE customer_id = ?",
+                              ((i,) for i in ids[deleted].tolist()))
+
+        summary = {
+            'inserted': int((~exists & ~deleted).sum()),
+            'updated': int((exists & ~deleted).sum()),
+            'deleted': int((exists & deleted).sum()),
+        }
+        self.conn.execute(
+            "INSERT INTO delta_log VALUES (?, ?, ?, ?, ?)",
+            (datetime.now().isoformat(timespec='seconds'),
+             source_name if source_name is not None else (None if isinstance(source, pd.DataFrame) else str(source)),
+             summary['inserted'], summary['updated'], summary['deleted'])
+        )
+        return summary
+
+    def load_snapshot(self, source):
+        """
+        Replace the state with a full customer file (the starting point for the deltas).
+
+        The file is parsed before the state is touched, and the reset and the
+        load are one transaction: a snapshot that fails leaves the previous
+        state in place. As for deltas, the last row of a repeated customer_id
+        wins and rows without an id are skipped.
+
+        :param source: Path of the customer CSV file or a DataFrame
+        :return: Dict as returned by apply_delta
+        """
+        delta = self._read_delta(source)
+        with self.conn:
+            self.conn.execute("DELETE FROM contracts")
+            self.conn.execute("DELETE FROM month_counts")
+            return self._apply(delta, source, None)
+
+    def _period_counts(self, start_dates, end_dates):
+        """Same counts as ContractIntervalIndex.period_counts, read from the monthly buckets."""
+        period_start = pd.DatetimeIndex(start_dates).to_numpy(dtype='datetime64[ns]')
+        period_end = pd.DatetimeIndex(end_dates).to_numpy(dtype='datetime64[ns]')
+        boundaries = np.concatenate([period_start, period_end])
+        if (np.isnat(boundaries).any()
+                or (boundaries != boundaries.astype('datetime64[M]').astype('datetime64[ns]')).any()):
+            raise ValueError("Incremental churn metrics are kept per month: "
+                             "periods must start and end on the first day of a month")
+
+        counts = pd.read_sql_query(
+            "SELECT bucket, starts, effective_ends, ends FROM month_counts ORDER BY bucket", self.conn
+        )
+        buckets = counts['bucket'].to_numpy()
+        cumulative = {c: np.concatenate([[0], np.cumsum(counts[c].to_numpy())])
+                      for c in ('starts', 'effective_ends', 'ends')}
+
+        def upto(counter, t):
+            # Events with bucket <= month of t
+            months = t.astype('datetime64[M]').astype(np.int64)
+            return cumulative[counter][np.searchsorted(buckets, months, side='right')]
+
+        at_start = upto('starts', period_start) - upto('effective_ends', period_start)
+        at_end = upto('starts', period_end) - upto('effective_ends', period_end)
+        churned = upto('ends', period_end) - upto('ends', period_start)
+        return at_start, at_end, churned
+
+    def calculate_churn_for_periods(self, periods):
+        """
+        Churn rates for a list of month-aligned periods.
+
+        :param periods: Iterable of (start_date, end_date) pairs on the first day of a month
+        :return: List of dicts with the same keys as ChurnCalculator.calculate_period_churn_rate
+        """
+        periods = list(periods)
+        if not periods:
+            return []
+        start_dates, end_dates = parse_periods(periods)
+        at_start, at_end, churned = self._period_counts(start_dates, end_dates)
+        return period_results(start_dates, end_dates, at_start, at_end, churned)
+
+    def calculate_monthly_churn_rates(self, year):
+        """
+        Monthly churn rates for a year (same table as ChurnCalculator).
+
+        :param year: Year for which to calculate monthly churn rates
+        :return: DataFrame with monthly churn rates
+        """
+        monthly_rates = self.calculate_churn_for_periods(month_periods(year))
+        for month, result in enumerate(monthly_rates, 1):
+            result['month'] = month
+        return pd.DataFrame(monthly_rates)
+
+    def calculate_quarterly_churn_rates(self, year):
+        """
+        Quarterly churn rates for a year (same table as ChurnCalculator).
+
+        :param year: Year for which to calculate quarterly churn rates
+        :return: DataFrame with quarterly churn rates
+        """
+        quarterly_rates = self.calculate_churn_for_periods(quarter_periods(year))
+        for quarter, result in enumerate(quarterly_rates, 1):
+            result['quarter'] = quarter
+        return pd.DataFrame(quarterly_rates)
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Maintain churn metrics incrementally from delta files.")
+    parser.add_argument('state', help="SQLite state file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    init = commands.add_parser('init', help="Load a full customer file as the starting state")
+    init.add_argument('data_file')
+    apply = commands.add_parser('apply', help="Apply one or more delta files, in order")
+    apply.add_argument('delta_files', nargs='+')
+    for name in ('monthly', 'quarterly'):
+        table = commands.add_parser(name, help=f"Print the {name} churn rates of a year")
+        table.add_argument('year', type=int)
+    args = parser.parse_args(argv)
+
+    with IncrementalChurnStore(args.state) as store:
+        if args.command == 'init':
+            summary = store.load_snapshot(args.data_file)
+            print(f"Loaded {summary['inserted']} customers from {args.data_file}")
+        elif args.command == 'apply':
+            for delta_file in args.delta_files:
+                summary = store.apply_delta(delta_file)
+                print(f"{delta_file}: {summary['inserted']} inserted, {summary['updated']} updated, "
+                      f"{summary['deleted']} deleted")
+        elif args.command == 'monthly':
+            print(store.calculate_monthly_churn_rates(args.year).to_string(index=False))
+        else:
+            print(store.calculate_quarterly_churn_rates(args.year).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+Stage-level instrumentation for the churn pipeline.
+
+StageMetrics records one entry per pipeline stage: wall and CPU time, the
+number of rows the stage touched (and returned), the resident set size after the stage and,
+when memory tracing is enabled, the peak of the memory allocated by the stage
+(tracemalloc, which also sees numpy buffers). Stages can be nested; each
+record keeps its nesting depth so that the time of a stage can be attributed
+to its sub-stages.
+
+The records are exported as JSON lines (one object per stage run, appended
+across runs so that nightly jobs build a history) or as a Prometheus text
+format file with per-stage totals, suitable for the node_exporter textfile
+collector.
+
+Usage:
+    metrics = StageMetrics(labels={'job': 'nightly'})
+    calculator = ChurnCalculator('customer_data_advanced.csv', metrics=metrics)
+    calculator.calculate_monthly_churn_rates(2024)
+    metrics.write('churn_metrics.jsonl')   # or churn_metrics.prom
+
+    with metrics.stage('export') as record:
+        record['rows'] = export(...)
+"""
+
+import contextlib
+import functools
+import inspect
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+PROMETHEUS_PREFIX = 'churn_stage'
+PROMETHEUS_EXTENSIONS = ('.prom',)
+_MB = 1024 * 1024
+
+
+def peak_rss_mb():
+    """Peak resident set size of the current process in MB (None if unavailable)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+def current_rss_mb():
+    """Current resident set size of the process in MB (None if unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):  # not Linux
+        return None
+    return round(resident_pages * os.sysconf('SC_PAGE_SIZE') / _MB, 1)
+
+
+def _result_rows(result):
+    """Number of rows of a stage result (None when it has no rows)."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if hasattr(result, 'shape') and getattr(result, 'ndim', 0) >= 1:
+        return int(result.shape[0])
+    if isinstance(result, list):
+        return len(result)
+    return None
+
+
+class StageMetrics:
+    """Collector of per-stage timings, row counts and memory figures."""
+
+    def __init__(self, trace_memory=False, labels=None):
+        """
+        :param trace_memory: If True, measure the allocation peak of every stage with
+                             tracemalloc (slows allocation-heavy stages down)
+        :param labels: Optional dict of labels added to every record (e.g. job name)
+        """
+        self.trace_memory = trace_memory
+        self.labels = dict(labels or {})
+        self.records = []
+        # One frame per open stage: [traced memory at entry, peak seen so far]
+        self._frames = []
+        self._started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """
+        Measure a block of code as one stage.
+
+        :param name: Stage name
+        :param rows: Rows touched, if known in advance; the yielded record's
+                     'rows' entry can also be set inside the block
+        :return: Context manager yielding the (mutable) record
+        """
+        record = {'stage': name, 'depth': len(self._frames), 'rows': rows}
+        tracing = self.trace_memory
+        if tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._frames:
+                # The enclosing stage keeps its own peak; ours starts from here
+                self._frames[-1][1] = max(self._frames[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._frames.append([current, current])
+        else:
+            self._frames.append(None)
+
+        rss_before = current_rss_mb()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        record['status'] = 'error'
+        try:
+            yield record
+            record['status'] = 'ok'
+        finally:
+            record['seconds'] = round(time.perf_counter() - started, 6)
+            record['cpu_seconds'] = round(time.process_time() - cpu_started, 6)
+            frame = self._frames.pop()
+            if tracing:
+                start_memory, peak_seen = frame
+                peak = max(peak_seen, tracemalloc.get_traced_memory()[1])
+                record['alloc_peak_mb'] = round((peak - start_memory) / _MB, 3)
+                if self._frames:
+                    self._frames[-1][1] = max(self._frames[-1][1], peak)
+                elif self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+            rss_after = current_rss_mb()
+            record['rss_mb'] = rss_after
+            record['rss_delta_mb'] = (round(rss_after - rss_before, 1)
+                                      if rss_after is not None and rss_before is not None else None)
+            record['peak_rss_mb'] = peak_rss_mb()
+            record['timestamp'] = datetime.now().isoformat(timespec='seconds')
+            record.update(self.labels)
+            self.records.append(record)
+
+    def wrap(self, function, name=None, owner=None):
+        """
+        Wrap a callable so that every call is recorded as a stage.
+
+        :param function: Callable to wrap
+        :param name: Stage name (default: the function name)
+        :param owner: Object whose ``df`` gives the rows touched (default: rows of the result)
+        :return: Wrapped callable
+        """
+        name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.stage(name) as record:
+                record['result_rows'] = None
+                result = function(*args, **kwargs)
+                result_rows = _result_rows(result)
+                df = getattr(owner, 'df', None)
+                record['rows'] = len(df) if df is not None else result_rows
+                record['result_rows'] = result_rows
+            return result
+
+        return wrapper
+
+    def instrument(self, obj, methods=None):
+        """
+        Record every call of the public methods of an object.
+
+        The bound methods are replaced on the instance only, so other
+        instances of the class are not affected.
+
+        :param obj: Object to instrument (e.g. a ChurnCalculator)
+        :param methods: Method names (default: all public methods of its class)
+        :return: The object
+        """
+        if methods is None:
+            methods = [name for name, _ in inspect.getmembers(type(obj), inspect.isfunction)
+                       if not name.startswith('_')]
+        for name in methods:
+            setattr(obj, name, self.wrap(getattr(obj, name), name, owner=obj))
+        return obj
+
+    def summary(self):
+        """
+        Totals per stage, in order of first appearance.
+
+        :return: Dict stage -> {'calls', 'seconds', 'cpu_seconds', 'rows', 'errors',
+                 'max_alloc_peak_mb'}
+        """
+        totals = {}
+        for record in self.records:
+            stage = totals.setdefault(record['stage'], {
+                'calls': 0, 'seconds': 0.0, 'cpu_seconds': 0.0, 'rows': 0, 'errors': 0,
+                'max_alloc_peak_mb': None
+            })
+            stage['calls'] += 1
+            stage['seconds'] += record['seconds']
+            stage['cpu_seconds'] += record['cpu_seconds']
+            stage['rows'] += record['rows'] or 0
+            stage['errors'] += record['status'] != 'ok'
+            if record.get('alloc_peak_mb') is not None:
+                stage['max_alloc_peak_mb'] = max(stage['max_alloc_peak_mb'] or 0.0,
+                                                 record['alloc_peak_mb'])
+        return totals
+
+    def to_json_lines(self, path, append=True):
+        """
+        Write the records as JSON lines.
+
+        :param path: Output file
+        :param append: If True, add to the existing file (history of runs)
+        :return: Number of records written
+        """
+        with open(path, 'a' if append else 'w', encoding='utf-8') as f:
+            for record in self.records:
+                f.write(json.dumps(record) + '\n')
+        return len(self.records)
+
+    def prometheus_text(self):
+        """Per-stage totals in the Prometheus text exposition format."""
+        labels = ''.join(f',{key}="{_escape(value)}"' for key, value in sorted(self.labels.items()))
+        metrics = [
+            ('seconds_total', 'counter', 'Wall time spent in the stage', 'seconds'),
+            ('cpu_seconds_total', 'counter', 'CPU time spent in the stage', 'cpu_seconds'),
+            ('calls_total', 'counter', 'Number of runs of the stage', 'calls'),
+            ('rows_total', 'counter', 'Rows touched by the stage', 'rows'),
+            ('errors_total', 'counter', 'Runs of the stage that raised an exception', 'errors'),
+            ('alloc_peak_bytes', 'gauge', 'Largest allocation peak of a run of the stage',
+             'max_alloc_peak_mb'),
+        ]
+        summary = self.summary()
+        lines = []
+        for suffix, kind, description, key in metrics:
+            name = f'{PROMETHEUS_PREFIX}_{suffix}'
+            samples = [(stage, values[key]) for stage, values in summary.items()
+                       if values[key] is not None]
+            if not samples:
+                continue
+            lines.append(f'# HELP {name} {description}.')
+            lines.append(f'# TYPE {name} {kind}')
+            for stage, value in samples:
+                if key == 'max_alloc_peak_mb':
+                    value = int(value * _MB)
+                lines.append(f'{name}{{stage="{_escape(stage)}"{labels}}} {_format_value(value)}')
+        peak = peak_rss_mb()
+        if peak is not None:
+            name = f'{PROMETHEUS_PREFIX}_process_peak_rss_bytes'
+            lines.append(f'# HELP {name} Peak resident set size of the process.')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f"{name}{{{labels[1:]}}} {int(peak * _MB)}" if labels else f'{name} {int(peak * _MB)}')
+        return '\n'.join(lines) + '\n'
+
+    def to_prometheus(self, path):
+        """
+        Write the per-stage totals as a Prometheus text format file.
+
+        The file is replaced atomically, so a collector never reads a partial file.
+
+        :param path: Output file (e.g. churn.prom in the textfile collector directory)
+        """
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temporary, path)
+
+    def write(self, path):
+        """
+        Export to a file, Prometheus text for .prom files and JSON lines otherwise.
+
+        :param path: Output file
+        """
+        if path.endswith(PROMETHEUS_EXTENSIONS):
+            self.to_prometheus(path)
+        else:
+            self.to_json_lines(path)
+
+
+def _escape(value):
+    """Prometheus label value escaping."""
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_value(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(int(value))
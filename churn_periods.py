@@ -0,0 +1,463 @@
+"""
+Period helpers shared by the churn rate engines.
+
+The batch engine (ChurnCalculator) and the incremental engine
+(churn_incremental) compute the same three counts per period; the helpers in
+this module build the standard period lists and turn the counts into the
+result dicts returned by ChurnCalculator.calculate_period_churn_rate.
+
+ContractIntervalIndex answers point-in-time queries on a loaded customer
+book (active customers at a date, contracts ended in a range) with binary
+searches over sorted contract endpoints; segment_period_counts computes the
+same counts for every segment of the book at once. rollup_counts derives
+quarter, half-year and year counts from the month counts without another
+pass over the data.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Customer attributes churn can be broken down by (alone or combined)
+SEGMENT_COLUMNS = [
+    'service_type', 'contract_type', 'payment_method',
+    'billing_method', 'customer_tenure_type'
+]
+
+
+def month_periods(year):
+    """
+    (start, end) pairs of the twelve months of a year.
+
+    :param year: Calendar year
+    :return: List of (YYYY-MM-DD, YYYY-MM-DD) tuples, end = first day of the next month
+    """
+    periods = []
+    for month in range(1, 13):
+        start_date = f"{year}-{month:02d}-01"
+        if month == 12:
+            end_date = f"{year+1}-01-01"
+        else:
+            end_date = f"{year}-{month+1:02d}-01"
+        periods.append((start_date, end_date))
+    return periods
+
+
+def quarter_periods(year):
+    """
+    (start, end) pairs of the four quarters of a year.
+
+    :param year: Calendar year
+    :return: List of (YYYY-MM-DD, YYYY-MM-DD) tuples, end = first day of the next quarter
+    """
+    periods = []
+    for start_month, end_month in [(1, 3), (4, 6), (7, 9), (10, 12)]:
+        start_date = f"{year}-{start_month:02d}-01"
+        if end_month == 12:
+            end_date = f"{year+1}-01-01"
+        else:
+            end_date = f"{year}-{end_month+1:02d}-01"
+        periods.append((start_date, end_date))
+    return periods
+
+
+# Number of months in each rollup grain of a calendar year
+ROLLUP_GRAINS = {'month': 1, 'quarter': 3, 'half': 6, 'year': 12}
+
+
+def rollup_counts(at_start, at_end, churned, months):
+    """
+    Roll month-level counts up to periods of consecutive months.
+
+    The counts are additive over adjacent periods: a period made of months
+    m1..mk has the customers active at the start of m1, the customers active
+    at the end of mk and the churn of all k months. Works along the last axis,
+    so (segments, months) arrays are rolled up per segment.
+
+    :param at_start: Active customers at each month start
+    :param at_end: Active customers at each month end
+    :param churned: Contracts ended within each month
+    :param months: Months per rolled-up period (e.g. ROLLUP_GRAINS['quarter'])
+    :return: Tuple of int64 arrays (customers_at_start, customers_at_end, churned_customers)
+    """
+    at_start, at_end, churned = (np.asarray(a, dtype=np.int64) for a in (at_start, at_end, churned))
+    n_months = at_start.shape[-1]
+    if months < 1 or n_months % months:
+        raise ValueError(f"Cannot roll {n_months} months up into periods of {months} months")
+    shape = at_start.shape[:-1] + (n_months // months, months)
+    return (at_start.reshape(shape)[..., 0], at_end.reshape(shape)[..., -1],
+            churned.reshape(shape).sum(axis=-1))
+
+
+def parse_periods(periods):
+    """
+    Split (start, end) pairs into two DatetimeIndex objects.
+
+    :param periods: Iterable of (start_date, end_date) pairs
+    :return: Tuple (start_dates, end_dates)
+    """
+    periods = list(periods)
+    return pd.to_datetime([p[0] for p in periods]), pd.to_datetime([p[1] for p in periods])
+
+
+def period_results(start_dates, end_dates, at_start, at_end, churned):
+    """
+    Result dicts for a list of periods.
+
+    :param start_dates: DatetimeIndex of period starts
+    :param end_dates: DatetimeIndex of period ends
+    :param at_start: Active customers at each period start
+    :param at_end: Active customers at each period end
+    :param churned: Contracts ended within each period
+    :return: List of dicts with keys period, customers_at_start, customers_at_end,
+             churned_customers and churn_rate (all zero when nobody was active at the start)
+    """
+    results = []
+    for start_date, end_date, n_start, n_end, n_churned in zip(
+        start_dates, end_dates, at_start, at_end, churned
+    ):
+        period = f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
+        if n_start > 0:
+            results.append({
+                'period': period,
+                'customers_at_start': int(n_start),
+                'customers_at_end': int(n_end),
+                'churned_customers': int(n_churned),
+                'churn_rate': round((int(n_churned) / int(n_start)) * 100, 2)
+            })
+        else:
+            results.append({
+                'period': period,
+                'customers_at_start': 0,
+                'customers_at_end': 0,
+                'churned_customers': 0,
+                'churn_rate': 0.0
+            })
+    return results
+
+
+def segment_results(segments, start_dates, end_dates, at_start, at_end, churned):
+    """
+    Segmented rates table from (segments, periods) count arrays.
+
+    :param segments: DataFrame with one row per segment (the segment columns)
+    :param start_dates: DatetimeIndex of period starts
+    :param end_dates: DatetimeIndex of period ends
+    :param at_start: (segments, periods) active customers at each period start
+    :param at_end: (segments, periods) active customers at each period end
+    :param churned: (segments, periods) contracts ended within each period
+    :return: DataFrame with the segment columns, period, customers_at_start,
+             customers_at_end, churned_customers and churn_rate, one row per
+             segment and period (periods varying fastest)
+    """
+    labels = [f"{s.strftime('%Y-%m-%d')} to {e.strftime('%Y-%m-%d')}"
+              for s, e in zip(start_dates, end_dates)]
+
+    n_periods = len(labels)
+    result = segments.loc[segments.index.repeat(n_periods)].reset_index(drop=True)
+    result['period'] = np.tile(labels, len(segments))
+    # Nobody active at the start: all zero (as in period_results)
+    active = at_start > 0
+    result['customers_at_start'] = at_start.ravel()
+    result['customers_at_end'] = np.where(active, at_end, 0).ravel()
+    result['churned_customers'] = np.where(active, churned, 0).ravel()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['churn_rate'] = np.where(active, np.round(churned / at_start * 100, 2), 0.0).ravel()
+    return result
+
+
+def rollup_results(year, grain, start_dates, end_dates, counts, segments=None):
+    """
+    Churn-rate table of a year at a granularity, from its month-level counts.
+
+    Shared by the in-memory and the SQL backends, which only differ in how
+    the month-level counts are computed.
+
+    :param year: Calendar year of the months
+    :param grain: 'month', 'quarter', 'half' or 'year' (see ROLLUP_GRAINS)
+    :param start_dates: DatetimeIndex of the 12 month starts
+    :param end_dates: DatetimeIndex of the 12 month ends
+    :param counts: Month-level (customers_at_start, customers_at_end, churned_customers),
+                   arrays of shape (months,) or (segments, months)
+    :param segments: Segment table of the rows of 2-D counts (None for the whole book)
+    :return: DataFrame with one row per period (and segment), numbered in a
+             column named after the grain ('year' holds the year itself)
+    """
+    if grain not in ROLLUP_GRAINS:
+        raise ValueError(f"Unknown grain {grain!r}: expected one of {list(ROLLUP_GRAINS)}")
+    months = ROLLUP_GRAINS[grain]
+    at_start, at_end, churned = rollup_counts(*counts, months)
+    start_dates, end_dates = start_dates[::months], end_dates[months - 1::months]
+
+    if segments is None:
+        rates = pd.DataFrame(period_results(start_dates, end_dates, at_start, at_end, churned))
+    else:
+        rates = segment_results(segments, start_dates, end_dates, at_start, at_end, churned)
+    n_periods = 12 // months
+    numbers = [year] if grain == 'year' else np.arange(1, n_periods + 1)
+    rates[grain] = np.tile(numbers, len(rates) // n_periods)
+    return rates
+
+
+def events_on_or_before(codes, n_segments, dates, boundaries, weights=None):
+    """
+    Cumulative per-segment event counts at sorted boundaries.
+
+    :param codes: int array, segment code of each event (or group of events)
+    :param n_segments: Number of segments
+    :param dates: datetime64[ns] array of event dates (no NaT)
+    :param boundaries: Sorted datetime64[ns] boundaries
+    :param weights: Optional number of events behind each date (e.g. GROUP BY counts)
+    :return: (n_segments, len(boundaries)) int64 array, counts[g, k] = events of
+             segment g with date <= boundaries[k]
+    """
+    width = len(boundaries) + 1
+    position = np.searchsorted(boundaries, dates, side='left')
+    histogram = np.bincount(codes * width + position, weights=weights, minlength=n_segments * width)
+    return np.cumsum(histogram.reshape(n_segments, width), axis=1)[:, :-1].astype(np.int64)
+
+
+def segment_period_counts(codes, n_segments, start_dates, end_dates, period_start, period_end):
+    """
+    Active and churned counts for every segment x period cell in one pass.
+
+    Each contract endpoint is placed in the bucket of the first period
+    boundary on or after it (np.searchsorted over the sorted boundaries);
+    one np.bincount per endpoint kind fills a (segments, boundaries + 1)
+    histogram whose cumulative sum along the boundaries gives, for every
+    segment, the number of contracts started/ended on or before each boundary.
+
+    :param codes: int array, segment code (0..n_segments-1) of each contract
+    :param n_segments: Number of segments
+    :param start_dates: datetime64[ns] contract start dates (NaT allowed)
+    :param end_dates: datetime64[ns] contract end dates (NaT allowed)
+    :param period_start: datetime64[ns] period starts
+    :param period_end: datetime64[ns] period ends
+    :return: Tuple of (n_segments, n_periods) int64 arrays
+             (customers_at_start, customers_at_end, churned_customers)
+    """
+    boundaries = np.unique(np.concatenate([period_start, period_end]))
+    has_start = ~np.isnat(start_dates)
+    has_end = ~np.isnat(end_dates)
+    both = has_start & has_end
+
+    def on_or_before(mask, dates):
+        # counts[g, k] = contracts of segment g with date <= boundaries[k]
+        return events_on_or_before(codes[mask], n_segments, dates[mask], boundaries)
+
+    started = on_or_before(has_start, start_dates)
+    # An end date before the start is clamped so that the contract is never active
+    effective_end = np.where(both, np.maximum(start_dates, end_dates), np.datetime64('NaT'))
+    stopped = on_or_before(both, effective_end)
+    ended = on_or_before(has_end, end_dates)
+
+    i = np.searchsorted(boundaries, period_start)
+    j = np.searchsorted(boundaries, period_end)
+    active = started - stopped
+    return active[:, i], active[:, j], ended[:, j] - ended[:, i]
+
+
+def as_datetime64(dates):
+    """datetime64[ns] array (and whether the input was a single date)."""
+    scalar = np.ndim(dates) == 0 and not isinstance(dates, (list, tuple))
+    values = pd.to_datetime([dates] if scalar else dates)
+    return pd.DatetimeIndex(values).to_numpy(dtype='datetime64[ns]'), scalar
+
+
+class _StabbingTree:
+    """
+    Centered interval tree over half-open [start, end) intervals, for stabbing queries.
+
+    The distinct endpoints split the time line into slots; the nodes of an
+    implicit balanced binary tree are the slot numbers 1..2**levels - 1 (a
+    node's height is its number of trailing zero bits). Every interval is
+    stored at the highest node among the slots it covers, so a point t can
+    only be in intervals stored on the root-to-leaf path of its slot; at each
+    of those O(log n) nodes the intervals containing t are a prefix of the
+    node's intervals sorted by first slot (left of the node) or by last slot
+    descending (right of it), found by binary search. A query therefore costs
+    O(log^2 n + k) for k results, with O(n) memory, instead of a scan of all
+    the contracts started by t.
+    """
+
+    def __init__(self, starts, ends):
+        """
+        :param starts: int64 array of interval starts
+        :param ends: int64 array of interval ends (exclusive; >= starts)
+        """
+        self.bounds = np.unique(np.concatenate([starts, ends]))
+        # Interval i covers the slots first[i]..last[i] (1-based, inclusive)
+        first = np.searchsorted(self.bounds, starts) + 1
+        last = np.searchsorted(self.bounds, ends)
+        covers = last >= first
+        self.levels = max(1, int(len(self.bounds)).bit_length())
+        positions = np.flatnonzero(covers)
+        first, last = first[covers], last[covers]
+
+        # Highest node in [first, last]: the number with the most trailing zero bits
+        differ = first ^ last
+        top_bit = np.frexp(differ.astype(np.float64))[1] - 1  # exact below 2**53
+        top_bit = np.where(differ > 0, top_bit, 0)
+        prefix = last & ~((np.int64(1) << (top_bit + 1)) - 1)
+        nodes = np.where(differ == 0, first,
+                         np.where(prefix >= first, prefix, prefix | (np.int64(1) << top_bit)))
+
+        by_first = np.lexsort((first, nodes))
+        by_last = np.lexsort((-last, nodes))
+        self.nodes = nodes[by_first]
+        self.first = first[by_first]
+        self.positions_by_first = positions[by_first]
+        self.minus_last = -last[by_last]
+        self.positions_by_last = positions[by_last]
+
+    def stab(self, t):
+        """Positions (in the input arrays, unsorted) of the intervals with start <= t < end."""
+        slot = int(np.searchsorted(self.bounds, t, side='right'))  # 1-based slot of t
+        if slot == 0:
+            return np.empty(0, dtype=np.int64)
+        found = []
+        node = step = 1 << (self.levels - 1)
+        while True:
+            lo = np.searchsorted(self.nodes, node, side='left')
+            hi = np.searchsorted(self.nodes, node, side='right')
+            if slot == node:
+                found.append(self.positions_by_first[lo:hi])
+                break
+            if slot < node:
+                # Stored intervals reach right of node: those starting by slot contain it
+                n = np.searchsorted(self.first[lo:hi], slot, side='right')
+                found.append(self.positions_by_first[lo:lo + n])
+            else:
+                # ... and start left of it: those ending at or after slot contain it
+                n = np.searchsorted(self.minus_last[lo:hi], -slot, side='right')
+                found.append(self.positions_by_last[lo:lo + n])
+            step //= 2
+            if step == 0:
+                break
+            node = node - step if slot < node else node + step
+        return np.concatenate(found)
+
+
+class ContractIntervalIndex:
+    """
+    Sorted contract endpoints of a customer book.
+
+    A contract is active at t when it started on or before t and its
+    (effective) end is after t. With the start dates, the effective end dates
+    and the end dates each kept in sorted arrays, every count is a difference
+    of two binary searches (O(log n) per date, vectorized over many dates).
+    Contracts without a start date are never active; an end date before the
+    start date is clamped to the start so that such rows are never counted as
+    active.
+
+    The index is built for a static book: when the data changes, build a new
+    one (ChurnCalculator does so whenever its DataFrame is replaced).
+    """
+
+    def __init__(self, customer_ids, start_dates, end_dates):
+        """
+        :param customer_ids: Array-like of customer ids
+        :param start_dates: Array-like of contract start dates (missing allowed)
+        :param end_dates: Array-like of contract end dates (missing allowed)
+        """
+        start = pd.to_datetime(pd.Series(start_dates)).to_numpy(dtype='datetime64[ns]')
+        end = pd.to_datetime(pd.Series(end_dates)).to_numpy(dtype='datetime64[ns]')
+        has_start = ~np.isnat(start)
+        has_end = ~np.isnat(end)
+        effective_end = np.where(has_end, np.maximum(start, end), np.datetime64('NaT'))
+
+        self.starts = np.sort(start[has_start])
+        self.effective_ends = np.sort(effective_end[has_start & has_end])
+        self.ends = np.sort(end[has_end])
+
+        # Contracts in start order, for active_set_at; open contracts end at +inf
+        order = np.argsort(start[has_start], kind='stable')
+        ids = pd.Series(customer_ids)
+        # Nullable integer ids with gaps are kept as objects: NumPy would turn them into floats
+        exact = object if isinstance(ids.dtype, pd.api.extensions.ExtensionDtype) and ids.hasnans else None
+        self._ids_by_start = ids.to_numpy(dtype=exact)[has_start][order]
+        self._effective_end_by_start = np.where(
+            np.isnat(effective_end), np.iinfo(np.int64).max, effective_end.view(np.int64)
+        )[has_start][order]
+        self._stabbing_tree = None
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build the index from a customer DataFrame.
+
+        :param df: DataFrame with customer_id, contract_start_date and contract_end_date
+        :return: ContractIntervalIndex
+        """
+        customer_ids = df['customer_id'] if 'customer_id' in df.columns else np.arange(len(df))
+        return cls(customer_ids, df['contract_start_date'], df['contract_end_date'])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def active_count_at(self, dates):
+        """
+        Number of active contracts at one or more dates.
+
+        :param dates: A date or an array-like of dates
+        :return: int for a single date, int64 array otherwise
+        """
+        t, scalar = as_datetime64(dates)
+        counts = (np.searchsorted(self.starts, t, side='right') -
+                  np.searchsorted(self.effective_ends, t, side='right'))
+        return int(counts[0]) if scalar else counts
+
+    def ended_count_at(self, dates):
+        """
+        Number of contracts ended on or before one or more dates.
+
+        :param dates: A date or an array-like of dates
+        :return: int for a single date, int64 array otherwise
+        """
+        t, scalar = as_datetime64(dates)
+        counts = np.searchsorted(self.ends, t, side='right')
+        return int(counts[0]) if scalar else counts
+
+    def churned_in_range(self, start_dates, end_dates):
+        """
+        Number of contracts with an end date in (start, end].
+
+        :param start_dates: A date or an array-like of range starts (exclusive)
+        :param end_dates: A date or an array-like of range ends (inclusive)
+        :return: int for a single range, int64 array otherwise
+        """
+        t0, scalar = as_datetime64(start_dates)
+        t1, _ = as_datetime64(end_dates)
+        counts = (np.searchsorted(self.ends, t1, side='right') -
+                  np.searchsorted(self.ends, t0, side='right'))
+        return int(counts[0]) if scalar else counts
+
+    def active_set_at(self, date):
+        """
+        Customer ids of the contracts active at a date.
+
+        Answered by a centered interval tree over the contracts (built on the
+        first call), in O(log^2 n + k) for k active contracts rather than a
+        scan of every contract started by the date.
+
+        :param date: A single date
+        :return: Array of customer ids, in contract start order
+        """
+        t, _ = as_datetime64(date)
+        if self._stabbing_tree is None:
+            # Built on first use: the counting queries do not need it
+            self._stabbing_tree = _StabbingTree(self.starts.view(np.int64), self._effective_end_by_start)
+        positions = np.sort(self._stabbing_tree.stab(t.view(np.int64)[0]))
+        return self._ids_by_start[positions]
+
+    def period_counts(self, start_dates, end_dates):
+        """
+        Active and churned counts for many periods in one pass.
+
+        :param start_dates: Array-like of period start dates
+        :param end_dates: Array-like of period end dates (same length)
+        :return: Tuple of int64 arrays (customers_at_start, customers_at_end, churned_customers)
+        """
+        period_start, _ = as_datetime64(start_dates)
+        period_end, _ = as_datetime64(end_dates)
+        return (self.active_count_at(period_start), self.active_count_at(period_end),
+                self.churned_in_range(period_start, period_end))
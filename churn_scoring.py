@@ -0,0 +1,403 @@
+"""
+Scoring-only entry point for the churn model.
+
+A model trained with ChurnCalculator.train_ml_model can be saved as a
+versioned bundle (estimator, categorical encoders, feature column list and a
+fingerprint of the training data) with ChurnCalculator.save_model. This
+module loads such a bundle and scores customers without importing the
+training or plotting code (matplotlib/seaborn), so scoring runs start fast.
+
+For books that do not fit in memory, score_in_batches streams customers in
+fixed-size chunks through the model, appends the scores to a CSV or Parquet
+sink and keeps only a bounded top-K list of high-risk customers.
+
+score_parallel spreads feature preparation and predict_proba over a pool of
+worker processes, one shard of customer_id range per task. Where 'fork' is
+available the workers share the parent's table and model copy-on-write;
+otherwise each worker loads the model once from the bundle file
+(memory-mapped) and receives its shard with the task.
+
+Usage:
+    python churn_scoring.py model.joblib customer_data.csv [--output scores.csv]
+    python churn_scoring.py model.joblib big_export.csv --batch-size 500000 --output scores.parquet
+"""
+
+import argparse
+import hashlib
+import heapq
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from customer_store import load_customer_data, iter_customer_csv, partition_paths
+from churn_features import build_feature_frame, encode_categoricals, to_feature_matrix
+
+# Bump when the bundle layout changes
+MODEL_BUNDLE_VERSION = 1
+
+# Customers above this probability are reported as high risk
+DEFAULT_THRESHOLD = 0.5
+
+# Batched scoring defaults
+DEFAULT_BATCH_SIZE = 100_000
+DEFAULT_TOP_K = 1000
+
+
+def data_fingerprint(df):
+    """
+    Content hash of a DataFrame, stored in the bundle to identify the training data.
+
+    :param df: Customer DataFrame
+    :return: Hex digest string
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(row_hashes.tobytes())
+    digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def save_model_bundle(path, estimator, label_encoders, feature_columns, fingerprint=None):
+    """
+    Save a fitted model and everything needed to score with it.
+
+    :param path: Destination file (joblib format)
+    :param estimator: Fitted classifier with predict_proba
+    :param label_encoders: Dict column -> fitted LabelEncoder
+    :param feature_columns: Feature names, in the order used for training
+    :param fingerprint: Fingerprint of the training data (see data_fingerprint)
+    """
+    import joblib
+    import sklearn
+
+    bundle = {
+        'format_version': MODEL_BUNDLE_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'sklearn_version': sklearn.__version__,
+        'estimator': estimator,
+        'label_encoders': label_encoders,
+        'feature_columns': list(feature_columns),
+        'training_data_fingerprint': fingerprint,
+    }
+    joblib.dump(bundle, path)
+
+
+def load_model_bundle(path, mmap_mode=None):
+    """
+    Load a model bundle saved with save_model_bundle.
+
+    :param path: Bundle file
+    :param mmap_mode: Passed to joblib.load ('r' memory-maps the model arrays)
+    :return: Bundle dict
+    """
+    import joblib
+
+    bundle = joblib.load(path, mmap_mode=mmap_mode)
+    version = bundle.get('format_version') if isinstance(bundle, dict) else None
+    if version != MODEL_BUNDLE_VERSION:
+        raise ValueError(
+            f"Unsupported model bundle version {version!r} in {path} "
+            f"(expected {MODEL_BUNDLE_VERSION})"
+        )
+    return bundle
+
+
+def select_high_risk(scored, threshold=DEFAULT_THRESHOLD, today=None):
+    """
+    Keep customers above the threshold whose contract has not ended yet.
+
+    :param scored: DataFrame with customer_id, contract_end_date and churn_probability
+    :param threshold: Minimum churn probability
+    :param today: Reference date for "already churned" (default: today)
+    :return: DataFrame sorted by descending churn probability
+    """
+    # Filter for customers with high probability of churning
+    # (stable sort: equal probabilities keep the row order, as in score_in_batches)
+    high_risk_customers = scored[scored['churn_probability'] > threshold].sort_values(
+        'churn_probability', ascending=False, kind='stable'
+    )
+
+    # Filter out customers whose contract ended before today
+    today = pd.to_datetime('today') if today is None else pd.to_datetime(today)
+    future_risk_customers = high_risk_customers[
+        (high_risk_customers['contract_end_date'].isna()) |
+        (high_risk_customers['contract_end_date'] > today)
+    ]
+
+    return future_risk_customers[['customer_id', 'churn_probability', 'contract_end_date']]
+
+
+def _score_frame(bundle, df, reference_date=None):
+    """Score one DataFrame: one row per customer with its churn probability."""
+    ml_df = build_feature_frame(df, reference_date)
+    encode_categoricals(ml_df, bundle['label_encoders'])
+
+    missing = [col for col in bundle['feature_columns'] if col not in ml_df.columns]
+    if missing:
+        raise ValueError(f"Data is missing model features: {missing}")
+
+    X = to_feature_matrix(ml_df, bundle['feature_columns'])
+    probabilities = bundle['estimator'].predict_proba(X)[:, 1]
+
+    return ml_df[['customer_id', 'contract_end_date']].assign(
+        churn_probability=probabilities.astype(np.float64)
+    )
+
+
+def score_customers(bundle, df, threshold=DEFAULT_THRESHOLD):
+    """
+    Score customers with a loaded bundle.
+
+    :param bundle: Bundle dict returned by load_model_bundle
+    :param df: Customer DataFrame (typed or raw)
+    :param threshold: Minimum churn probability for the high-risk list
+    :return: Tuple (scores, high_risk) where scores has one row per customer
+    """
+    scores = _score_frame(bundle, df)
+    return scores, select_high_risk(scores, threshold)
+
+
+class _ScoreSink:
+    """Append-only writer for score batches (CSV, or Parquet by file extension)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+        self._writer = None
+        self._schema = None
+        self._first = True
+
+    def write(self, scores):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # Chunks are typed independently (e.g. int16 vs int32 ids): widen integers
+            widened = {col: 'int64' for col in scores.columns
+                       if pd.api.types.is_integer_dtype(scores[col].dtype)}
+            table = pa.Table.from_pandas(scores.astype(widened), preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                table = table.cast(self._schema)
+            self._writer.write_table(table)
+        else:
+            scores.to_csv(self.path, mode='w' if self._first else 'a',
+                          header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _iter_batches(source, batch_size):
+    """Yield DataFrame batches from CSV path(s) or an in-memory DataFrame."""
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), batch_size):
+            yield source.iloc[start:start + batch_size]
+    else:
+        # Partitioned exports are streamed one file after the other
+        for path in partition_paths(source):
+            yield from iter_customer_csv(path, batch_size)
+
+
+def score_in_batches(bundle, source, batch_size=DEFAULT_BATCH_SIZE, sink=None,
+                     top_k=DEFAULT_TOP_K, threshold=DEFAULT_THRESHOLD):
+    """
+    Score customers chunk by chunk with flat peak memory.
+
+    Only one batch of customers is in memory at a time. All scores are
+    appended to ``sink`` (if given); the high-risk list is kept in a min-heap
+    of at most ``top_k`` entries instead of sorting every customer.
+
+    :param bundle: Bundle dict (estimator, label_encoders, feature_columns)
+    :param source: Path to a customer CSV file (or a list of paths, a directory or a
+                   glob pattern, see customer_store.partition_paths), or a DataFrame
+    :param batch_size: Customers per batch
+    :param sink: Optional output path (.csv, or .parquet/.pq with pyarrow)
+    :param top_k: Size of the high-risk list
+    :param threshold: Minimum churn probability for the high-risk list
+    :return: Tuple (number of customers scored, top-K high-risk DataFrame)
+    """
+    # Same reference dates for every batch
+    reference_date = pd.to_datetime('today')
+    writer = _ScoreSink(sink) if sink else None
+    heap = []
+    n_scored = 0
+    try:
+        for batch in _iter_batches(source, batch_size):
+            scores = _score_frame(bundle, batch, reference_date)
+            n_scored += len(scores)
+            if writer is not None:
+                writer.write(scores)
+
+            # Candidates: above threshold and contract not ended yet
+            probability = scores['churn_probability'].to_numpy()
+            end_date = scores['contract_end_date']
+            mask = (probability > threshold) & (end_date.isna() | (end_date > reference_date)).to_numpy()
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > top_k:
+                # Same order as the heap: higher probability first, then earlier row
+                # (argpartition would pick arbitrarily among equal probabilities)
+                best = np.lexsort((candidates, -probability[candidates]))[:top_k]
+                candidates = candidates[best]
+
+            # Objects keep nullable integer ids exact (no float conversion for gaps)
+            ids = scores['customer_id'].to_numpy(dtype=object)
+            ends = end_date.to_numpy()
+            for i in candidates:
+                # The running row number breaks ties without comparing ids/dates
+                item = (probability[i], -(n_scored - len(scores) + i), ids[i], ends[i])
+                if len(heap) < top_k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    top = sorted(heap, reverse=True)
+    high_risk = pd.DataFrame({
+        'customer_id': [item[2] for item in top],
+        'churn_probability': [float(item[0]) for item in top],
+        'contract_end_date': pd.to_datetime([item[3] for item in top]),
+    })
+    return n_scored, high_risk
+
+
+# State of a scoring worker process (bundle, and with fork the shared table)
+_WORKER_STATE = {}
+
+
+def _init_scoring_worker(model_path):
+    """Load the model once per worker and keep each worker single-threaded."""
+    if model_path is not None:
+        _WORKER_STATE['bundle'] = load_model_bundle(model_path, mmap_mode='r')
+    estimator = _WORKER_STATE['bundle']['estimator']
+    if 'n_jobs' in estimator.get_params():
+        # Parallelism comes from the pool; avoid oversubscribing the cores
+        estimator.set_params(n_jobs=1)
+
+
+def _score_shard(shard, reference_date):
+    """Score one shard: a (start, stop) range of the shared table, or a DataFrame."""
+    if isinstance(shard, tuple):
+        start, stop = shard
+        shard = _WORKER_STATE['df'].iloc[_WORKER_STATE['order'][start:stop]]
+    scores = _score_frame(_WORKER_STATE['bundle'], shard, reference_date)
+    return scores['churn_probability'].to_numpy()
+
+
+def score_parallel(bundle, df, n_workers=None, threshold=DEFAULT_THRESHOLD, model_path=None):
+    """
+    Score customers on a process pool, sharding the table by customer_id range.
+
+    :param bundle: Bundle dict (estimator, label_encoders, feature_columns)
+    :param df: Customer DataFrame
+    :param n_workers: Worker processes (default: all CPUs)
+    :param threshold: Minimum churn probability for the high-risk list
+    :param model_path: Bundle file to load in the workers when 'fork' is not
+                       available (a temporary one is written if not given)
+    :return: Tuple (scores, high_risk) as returned by score_customers
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    reference_date = pd.to_datetime('today')
+
+    # Contiguous customer_id ranges of (almost) equal size
+    order = np.argsort(df['customer_id'].to_numpy(dtype=np.float64, na_value=np.nan), kind='stable')
+    bounds = np.linspace(0, len(df), n_workers + 1).astype(int)
+    ranges = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    use_fork = 'fork' in multiprocessing.get_all_start_methods()
+    tmp_path = None
+    try:
+        if use_fork:
+            # Workers inherit the table, the order and the model copy-on-write
+            _WORKER_STATE.update(bundle=bundle, df=df, order=order)
+            context = multiprocessing.get_context('fork')
+            shards = ranges
+            model_path = None
+        else:
+            if model_path is None:
+                fd, tmp_path = tempfile.mkstemp(suffix='.joblib')
+                os.close(fd)
+                save_model_bundle(tmp_path, bundle['estimator'], bundle['label_encoders'],
+                                  bundle['feature_columns'])
+                model_path = tmp_path
+            context = multiprocessing.get_context('spawn')
+            shards = [df.iloc[order[a:b]] for a, b in ranges]
+
+        with ProcessPoolExecutor(max_workers=len(ranges) or 1, mp_context=context,
+                                 initializer=_init_scoring_worker,
+                                 initargs=(model_path,)) as pool:
+            parts = list(pool.map(_score_shard, shards, repeat(reference_date)))
+    finally:
+        _WORKER_STATE.clear()
+        if tmp_path is not None:
+            os.remove(tmp_path)
+
+    # Put the shard results back in the original row order
+    probabilities = np.empty(len(df), dtype=np.float64)
+    probabilities[order] = np.concatenate(parts) if parts else np.empty(0)
+
+    scores = df[['customer_id', 'contract_end_date']].assign(churn_probability=probabilities)
+    scores['contract_end_date'] = pd.to_datetime(scores['contract_end_date'])
+    return scores, select_high_risk(scores, threshold, reference_date)
+
+
+def main(argv=None):
+    """Score a customer file with a saved model bundle."""
+    parser = argparse.ArgumentParser(description="Score customers with a saved churn model.")
+    parser.add_argument('model', help="Model bundle saved with ChurnCalculator.save_model")
+    parser.add_argument('data_file', help="Customer CSV file, directory or glob pattern of partition files")
+    parser.add_argument('--output', help="Write all scores to this CSV file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Churn probability above which customers are high risk")
+    parser.add_argument('--batch-size', type=int,
+                        help="Score the file in batches of this many customers (constant memory)")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K,
+                        help="Size of the high-risk list in batched mode")
+    parser.add_argument('--workers', type=int,
+                        help="Score on a pool of this many worker processes")
+    args = parser.parse_args(argv)
+
+    bundle = load_model_bundle(args.model)
+    if args.batch_size:
+        n_scored, high_risk = score_in_batches(
+            bundle, args.data_file, args.batch_size, sink=args.output,
+            top_k=args.top_k, threshold=args.threshold
+        )
+        if args.output:
+            print(f"Scores for {n_scored} customers written to {args.output}")
+        print(f"\nTop {len(high_risk)} customers with high probability of churning:")
+        if not high_risk.empty:
+            print(high_risk.head(10))
+        return 0
+
+    df = load_customer_data(args.data_file)
+    if args.workers and args.workers > 1:
+        scores, high_risk = score_parallel(bundle, df, args.workers, args.threshold,
+                                           model_path=args.model)
+    else:
+        scores, high_risk = score_customers(bundle, df, args.threshold)
+
+    if args.output:
+        scores.to_csv(args.output, index=False)
+        print(f"Scores for {len(scores)} customers written to {args.output}")
+
+    print(f"\nCustomers with high probability of churning: {len(high_risk)}")
+    if not high_risk.empty:
+        print(high_risk.head(10))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
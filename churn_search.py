@@ -0,0 +1,130 @@
+"""
+Budgeted hyperparameter search for the churn RandomForest.
+
+successive_halving_search samples a set of candidate configurations and
+trains them in rounds ("rungs"). Forests are warm-started: at every rung the
+surviving candidates grow more trees on top of the ones they already have
+instead of being refitted from scratch, and only the best 1/eta of them move
+on to the next rung. The search stops when one candidate is left, when the
+maximum number of trees is reached or when the time budget is spent.
+
+Candidates of a rung are trained in parallel with joblib; the backend can be
+'loky' (process pool, default), 'multiprocessing' or 'threading'.
+"""
+
+import math
+import time
+
+import numpy as np
+from joblib import Parallel, delayed, parallel_backend
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler, train_test_split
+from sklearn.utils.class_weight import compute_class_weight
+
+# Search space for the RandomForest (n_estimators is the halving resource)
+RF_PARAM_DISTRIBUTIONS = {
+    'max_depth': [None, 10, 20, 30],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 'log2', None],
+}
+
+SEARCH_BACKENDS = ('loky', 'multiprocessing', 'threading')
+
+
+def _grow_and_score(estimator, n_estimators, X_train, y_train, X_val, y_val, scorer):
+    """Add trees to a warm-started forest and score it on the validation split."""
+    estimator.set_params(n_estimators=n_estimators)
+    estimator.fit(X_train, y_train)
+    return estimator, scorer(estimator, X_val, y_val)
+
+
+def successive_halving_search(X, y, class_weight=None, param_distributions=None,
+                              n_candidates=16, min_estimators=25, max_estimators=200,
+                              eta=2, time_budget=None, scoring='accuracy',
+                              n_jobs=-1, backend='loky', random_state=42, verbose=True):
+    """
+    Successive-halving search over warm-started RandomForest candidates.
+
+    :param X: Training features
+    :param y: Training target
+    :param class_weight: class_weight passed to every forest
+    :param param_distributions: Search space (defaults to RF_PARAM_DISTRIBUTIONS)
+    :param n_candidates: Number of sampled configurations in the first rung
+    :param min_estimators: Trees per forest in the first rung
+    :param max_estimators: Maximum trees per forest
+    :param eta: Fraction of candidates dropped at each rung is 1 - 1/eta
+    :param time_budget: Optional wall-clock budget in seconds (checked between rungs)
+    :param scoring: Scikit-learn scoring name used on the validation split
+    :param n_jobs: Parallel candidates per rung
+    :param backend: Joblib backend, one of SEARCH_BACKENDS
+    :param random_state: Seed for sampling, splitting and the forests
+    :param verbose: Print one line per rung
+    :return: Tuple (best_estimator, best_params, best_score, history); the best
+             estimator is refitted on all of X with the final number of trees
+    """
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(f"backend must be one of {SEARCH_BACKENDS}, got {backend!r}")
+    param_distributions = RF_PARAM_DISTRIBUTIONS if param_distributions is None else param_distributions
+    scorer = get_scorer(scoring)
+    started = time.perf_counter()
+
+    if class_weight == 'balanced':
+        # Warm-started forests need fixed weights: compute them once on the full target
+        classes = np.unique(y)
+        class_weight = dict(zip(classes, compute_class_weight('balanced', classes=classes, y=y)))
+
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X, y, test_size=0.25, random_state=random_state, stratify=y
+    )
+
+    candidates = list(ParameterSampler(param_distributions, n_iter=n_candidates,
+                                       random_state=random_state))
+    estimators = [
+        RandomForestClassifier(random_state=random_state, class_weight=class_weight,
+                               warm_start=True, n_jobs=1, **params)
+        for params in candidates
+    ]
+
+    history = []
+    n_estimators = min_estimators
+    scores = []
+    while True:
+        with parallel_backend(backend, n_jobs=n_jobs):
+            results = Parallel()(
+                delayed(_grow_and_score)(est, n_estimators, X_fit, y_fit, X_val, y_val, scorer)
+                for est in estimators
+            )
+        estimators = [est for est, _ in results]
+        scores = [score for _, score in results]
+        elapsed = time.perf_counter() - started
+        history.append({
+            'n_estimators': n_estimators,
+            'n_candidates': len(estimators),
+            'best_score': max(scores),
+            'elapsed_seconds': round(elapsed, 3),
+        })
+        if verbose:
+            print(f"  rung {len(history)}: {len(estimators)} candidates x {n_estimators} trees, "
+                  f"best {scoring} {max(scores):.4f} ({elapsed:.1f}s)")
+
+        out_of_budget = time_budget is not None and elapsed >= time_budget
+        if len(estimators) == 1 or n_estimators >= max_estimators or out_of_budget:
+            break
+
+        # Keep the best 1/eta candidates and give them more trees
+        keep = max(1, math.ceil(len(estimators) / eta))
+        order = np.argsort(scores)[::-1][:keep]
+        estimators = [estimators[i] for i in order]
+        candidates = [candidates[i] for i in order]
+        n_estimators = min(max_estimators, n_estimators * eta)
+
+    best = int(np.argmax(scores))
+    best_params = dict(candidates[best], n_estimators=n_estimators)
+
+    # Refit the winner on the whole training set
+    best_estimator = clone(estimators[best]).set_params(warm_start=False, n_jobs=n_jobs)
+    best_estimator.fit(X, y)
+    return best_estimator, best_params, scores[best], history
@@ -0,0 +1,401 @@
+"""
+Embedded SQL backend for the churn calculations.
+
+SqlChurnStore bulk-loads a customer export (a CSV file or a partitioned
+export, see customer_store.partition_paths) once into a local SQLite file,
+chunk by chunk, and answers the same period queries as
+churn_periods.ContractIntervalIndex without ever holding the customer book
+in memory:
+- the contract dates are stored as integer nanoseconds, with the effective
+  end (an end date before the start is clamped to the start) precomputed,
+  and indexed together with customer_id;
+- every count is pushed down as a set-based aggregation
+  (SELECT date, COUNT(*) ... GROUP BY date, optionally per segment), which
+  the database answers from the date indexes; only the per-date totals
+  (a few thousand rows for a multi-year book) come back to Python, where
+  cumulative sums give the counts at any period boundary.
+
+ChurnCalculator(data_file, backend='sqlite') uses the store for the period,
+monthly, quarterly, time-series and segment calculations, so the Python API
+is unchanged for larger-than-memory exports. The database is reloaded only
+when the source files change (path, size and modification time).
+
+Usage:
+    python churn_sql.py churn.sqlite load customer_data_advanced.csv
+    python churn_sql.py churn.sqlite monthly 2024 --by service_type
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from customer_store import RATE_COLUMNS, is_partitioned, iter_customer_csv, partition_paths
+from churn_periods import (
+    SEGMENT_COLUMNS, as_datetime64, events_on_or_before, month_periods, parse_periods,
+    period_results, rollup_results
+)
+
+DEFAULT_CHUNK_ROWS = 200_000
+DEFAULT_DATABASE_SUFFIX = '.sqlite'
+
+# Columns kept in the database: contract dates and the attributes churn is segmented by
+STORED_COLUMNS = RATE_COLUMNS + SEGMENT_COLUMNS
+
+# Table the customers are loaded into before replacing the current ones
+_STAGING_TABLE = 'customers_loading'
+
+_INDEXES = {
+    'idx_customers_customer_id': 'customer_id',
+    'idx_customers_start': 'start_ns',
+    'idx_customers_end': 'end_ns',
+    'idx_customers_effective_end': 'effective_end_ns',
+}
+
+
+def _ns_values(dates):
+    """datetime64[ns] array -> list of int nanoseconds / None."""
+    values = dates.view(np.int64).astype(object)
+    values[np.isnat(dates)] = None
+    return values.tolist()
+
+
+def _column_values(series):
+    """Column -> list of Python values / None."""
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def source_signature(source):
+    """
+    Identity of the current version of a customer export.
+
+    :param source: Path, list of paths, directory or glob pattern
+    :return: JSON string of (absolute path, size, modification time) per file
+    """
+    files = []
+    for path in partition_paths(source):
+        stat = os.stat(path)
+        files.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    return json.dumps(files)
+
+
+def default_database_path(source):
+    """SQLite file used for a single-file source when none is given (next to the CSV)."""
+    if is_partitioned(source):
+        raise ValueError("A database path is required for a partitioned source")
+    if not os.path.isfile(source):
+        raise FileNotFoundError(f"Customer file not found: {source}")
+    return os.fspath(source) + DEFAULT_DATABASE_SUFFIX
+
+
+class SqlChurnStore:
+    """Customer contracts in an SQLite file, queried with set-based aggregations."""
+
+    def __init__(self, path):
+        """
+        Open (or create) the database.
+
+        :param path: Path of the SQLite file (':memory:' for a throwaway store)
+        """
+        self.path = path
+        # Transactions are explicit (see load): the sqlite3 module would otherwise
+        # commit the DROP/CREATE TABLE statements on its own
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS load_info (key TEXT PRIMARY KEY, value TEXT)")
+        self._histograms = {}
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _info(self, key):
+        row = self.conn.execute("SELECT value FROM load_info WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    @property
+    def segment_columns(self):
+        """Segment columns available in the loaded data."""
+        return json.loads(self._info('segment_columns') or '[]')
+
+    def __len__(self):
+        return int(self._info('rows') or 0)
+
+    def load(self, source, chunk_size=DEFAULT_CHUNK_ROWS):
+        """
+        Replace the stored customers with a customer export.
+
+        The files are read in chunks of chunk_size rows (constant memory) into
+        a staging table; the indexes are built after the insert, which is much
+        faster than maintaining them row by row. The staging table replaces
+        the customers and load_info is updated in the same transaction, so a
+        load that fails or is interrupted leaves the previous data in place.
+
+        :param source: Path, list of paths, directory or glob pattern
+        :param chunk_size: Rows per chunk
+        :return: Number of customers loaded
+        """
+        signature = source_signature(source)
+        n_rows = 0
+        segment_columns = None
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute(f"DROP TABLE IF EXISTS {_STAGING_TABLE}")
+            for path in partition_paths(source):
+                for chunk in iter_customer_csv(path, chunk_size, columns=STORED_COLUMNS):
+                    if segment_columns is None:
+                        segment_columns = [col for col in SEGMENT_COLUMNS if col in chunk.columns]
+                        self._create_table(segment_columns)
+                    n_rows += self._insert_chunk(chunk, segment_columns)
+            if segment_columns is None:
+                self._create_table([])
+            self.conn.execute("DROP TABLE IF EXISTS customers")
+            self.conn.execute(f"ALTER TABLE {_STAGING_TABLE} RENAME TO customers")
+            for name, column in _INDEXES.items():
+                self.conn.execute(f"CREATE INDEX {name} ON customers ({column})")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO load_info VALUES (?, ?)",
+                [('source', signature), ('rows', str(n_rows)),
+                 ('segment_columns', json.dumps(segment_columns or [])),
+                 ('loaded_at', datetime.now().isoformat(timespec='seconds'))]
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            # KeyboardInterrupt included: never leave a half-loaded table behind
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("ANALYZE")
+        self._histograms = {}
+        return n_rows
+
+    def ensure_loaded(self, source, chunk_size=DEFAULT_CHUNK_ROWS):
+        """
+        Load a customer export unless the database already holds this version of it.
+
+        :param source: Path, list of paths, directory or glob pattern
+        :param chunk_size: Rows per chunk
+        :return: True if the data was (re)loaded
+        """
+        if self._info('source') == source_signature(source):
+            return False
+        self.load(source, chunk_size)
+        return True
+
+    def _create_table(self, segment_columns):
+        segments = ''.join(f', "{col}" TEXT' for col in segment_columns)
+        self.conn.execute(
+            f"CREATE TABLE {_STAGING_TABLE} (customer_id, start_ns INTEGER, end_ns INTEGER, "
+            f"effective_end_ns INTEGER{segments})"
+        )
+
+    def _insert_chunk(self, chunk, segment_columns):
+        """Insert one typed chunk; returns its number of rows."""
+        start = pd.to_datetime(chunk['contract_start_date']).to_numpy(dtype='datetime64[ns]')
+        end = pd.to_datetime(chunk['contract_end_date']).to_numpy(dtype='datetime64[ns]')
+        # An end date before the start is clamped so that the contract is never active
+        effective_end = np.where(~np.isnat(start) & ~np.isnat(end), np.maximum(start, end),
+                                 np.datetime64('NaT'))
+        columns = [_column_values(chunk['customer_id']), _ns_values(start), _ns_values(end),
+                   _ns_values(effective_end)]
+        columns += [_column_values(chunk[col]) for col in segment_columns]
+        placeholders = ', '.join('?' * len(columns))
+        self.conn.executemany(f"INSERT INTO {_STAGING_TABLE} VALUES ({placeholders})", zip(*columns))
+        return len(chunk)
+
+    def _histogram(self, column, by=()):
+        """
+        Number of contracts per distinct date of a column (and segment), computed in SQL.
+
+        :return: DataFrame with the segment columns, 'date' (int nanoseconds) and 'n'
+        """
+        key = (column, tuple(by))
+        if key not in self._histograms:
+            segments = ''.join(f'"{col}", ' for col in by)
+            self._histograms[key] = pd.read_sql_query(
+                f"SELECT {segments}{column} AS date, COUNT(*) AS n FROM customers "
+                f"WHERE {column} IS NOT NULL GROUP BY {segments}{column} ORDER BY {column}",
+                self.conn
+            )
+        return self._histograms[key]
+
+    def _on_or_before(self, column, dates):
+        """Contracts with a value of column on or before each date."""
+        histogram = self._histogram(column)
+        cumulative = np.concatenate([[0], np.cumsum(histogram['n'].to_numpy())])
+        position = np.searchsorted(histogram['date'].to_numpy(dtype=np.int64),
+                                   dates.view(np.int64), side='right')
+        return cumulative[position]
+
+    def active_count_at(self, dates):
+        """
+        Number of active contracts at one or more dates (see ContractIntervalIndex).
+
+        :param dates: A date or an array-like of dates
+        :return: int for a single date, int64 array otherwise
+        """
+        t, scalar = as_datetime64(dates)
+        counts = self._on_or_before('start_ns', t) - self._on_or_before('effective_end_ns', t)
+        return int(counts[0]) if scalar else counts
+
+    def ended_count_at(self, dates):
+        """
+        Number of contracts ended on or before one or more dates.
+
+        :param dates: A date or an array-like of dates
+        :return: int for a single date, int64 array otherwise
+        """
+        t, scalar = as_datetime64(dates)
+        counts = self._on_or_before('end_ns', t)
+        return int(counts[0]) if scalar else counts
+
+    def churned_in_range(self, start_dates, end_dates):
+        """
+        Number of contracts with an end date in (start, end].
+
+        :param start_dates: A date or an array-like of range starts (exclusive)
+        :param end_dates: A date or an array-like of range ends (inclusive)
+        :return: int for a single range, int64 array otherwise
+        """
+        t0, scalar = as_datetime64(start_dates)
+        t1, _ = as_datetime64(end_dates)
+        counts = self._on_or_before('end_ns', t1) - self._on_or_before('end_ns', t0)
+        return int(counts[0]) if scalar else counts
+
+    def active_set_at(self, date):
+        """
+        Customer ids of the contracts active at a date.
+
+        :param date: A single date
+        :return: Array of customer ids, in contract start order
+        """
+        t, _ = as_datetime64(date)
+        t = int(t.view(np.int64)[0])
+        rows = self.conn.execute(
+            "SELECT customer_id FROM customers WHERE start_ns <= ? "
+            "AND (effective_end_ns IS NULL OR effective_end_ns > ?) ORDER BY start_ns",
+            (t, t)
+        ).fetchall()
+        return np.array([row[0] for row in rows])
+
+    def period_counts(self, start_dates, end_dates):
+        """
+        Active and churned counts for many periods.
+
+        :param start_dates: Array-like of period start dates
+        :param end_dates: Array-like of period end dates (same length)
+        :return: Tuple of int64 arrays (customers_at_start, customers_at_end, churned_customers)
+        """
+        period_start, _ = as_datetime64(start_dates)
+        period_end, _ = as_datetime64(end_dates)
+        return (self.active_count_at(period_start), self.active_count_at(period_end),
+                self.churned_in_range(period_start, period_end))
+
+    def segment_counts(self, start_dates, end_dates, by):
+        """
+        Active and churned counts for every segment x period cell.
+
+        Same result as churn_periods.segment_period_counts on the whole book,
+        from three GROUP BY segment, date aggregations.
+
+        :param start_dates: DatetimeIndex of period starts
+        :param end_dates: DatetimeIndex of period ends
+        :param by: Segment column or list of columns
+        :return: Tuple (segment table sorted like DataFrame.groupby, (at_start, at_end,
+                 churned) arrays of shape (segments, periods))
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        missing = [col for col in by if col not in self.segment_columns]
+        if missing:
+            raise ValueError(f"Segment columns not in the data: {missing}")
+
+        columns = ', '.join(f'"{col}"' for col in by)
+        segments = pd.read_sql_query(f"SELECT DISTINCT {columns} FROM customers", self.conn)
+        segments = segments.sort_values(by, na_position='last', ignore_index=True)
+        segment_index = pd.MultiIndex.from_frame(segments)
+
+        period_start = pd.DatetimeIndex(start_dates).to_numpy(dtype='datetime64[ns]')
+        period_end = pd.DatetimeIndex(end_dates).to_numpy(dtype='datetime64[ns]')
+        boundaries = np.unique(np.concatenate([period_start, period_end]))
+
+        def on_or_before(column):
+            histogram = self._histogram(column, by)
+            codes = segment_index.get_indexer(pd.MultiIndex.from_frame(histogram[by]))
+            return events_on_or_before(codes, len(segments),
+                                       histogram['date'].to_numpy(dtype=np.int64).view('datetime64[ns]'),
+                                       boundaries, weights=histogram['n'].to_numpy())
+
+        i = np.searchsorted(boundaries, period_start)
+        j = np.searchsorted(boundaries, period_end)
+        active = on_or_before('start_ns') - on_or_before('effective_end_ns')
+        ended = on_or_before('end_ns')
+        return segments, (active[:, i], active[:, j], ended[:, j] - ended[:, i])
+
+    def calculate_churn_for_periods(self, periods):
+        """
+        Churn rates for a list of periods.
+
+        :param periods: Iterable of (start_date, end_date) pairs
+        :return: List of dicts with the same keys as ChurnCalculator.calculate_period_churn_rate
+        """
+        periods = list(periods)
+        if not periods:
+            return []
+        start_dates, end_dates = parse_periods(periods)
+        return period_results(start_dates, end_dates, *self.period_counts(start_dates, end_dates))
+
+    def calculate_rollup_churn_rates(self, year, grain='month', by=None):
+        """
+        Churn rates of a year per month, quarter, half or year (same table as ChurnCalculator).
+
+        :param year: Calendar year
+        :param grain: 'month', 'quarter', 'half' or 'year'
+        :param by: Optional segment column(s): rates per segment and period
+        :return: DataFrame with one row per period (and segment)
+        """
+        start_dates, end_dates = parse_periods(month_periods(year))
+        if by is None:
+            segments, counts = None, self.period_counts(start_dates, end_dates)
+        else:
+            segments, counts = self.segment_counts(start_dates, end_dates, by)
+        return rollup_results(year, grain, start_dates, end_dates, counts, segments)
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Churn rates computed in an embedded SQLite database.")
+    parser.add_argument('database', help="SQLite database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('load', help="Bulk-load a customer file, directory or glob pattern")
+    load.add_argument('source', nargs='+')
+    load.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per insert chunk")
+    for name in ('monthly', 'quarterly'):
+        table = commands.add_parser(name, help=f"Print the {name} churn rates of a year")
+        table.add_argument('year', type=int)
+        table.add_argument('--by', nargs='+', help="Segment columns")
+    args = parser.parse_args(argv)
+
+    with SqlChurnStore(args.database) as store:
+        if args.command == 'load':
+            source = args.source[0] if len(args.source) == 1 else args.source
+            print(f"Loaded {store.load(source, args.chunk_size)} customers into {args.database}")
+            return 0
+
+        grain = 'month' if args.command == 'monthly' else 'quarter'
+        rates = store.calculate_rollup_churn_rates(args.year, grain, by=args.by)
+        print(rates.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,501 @@
+"""
+Motore comune per la generazione dei dataset sintetici dei clienti.
+
+I tre layout (base = customer_data_large.csv, enriched, advanced) sono
+composti da gruppi di colonne. Ogni gruppo è una funzione vettoriale che
+estrae le sue colonne come array NumPy e può leggere le colonne dei gruppi da
+cui dipende; ogni gruppo viene calcolato una sola volta per blocco anche
+quando si generano più layout insieme, che quindi condividono le stesse
+colonne di base (stessi clienti, stesse date).
+
+Ogni gruppo ha un suo generatore casuale derivato dal seed del blocco, per
+cui le colonne di un gruppo non dipendono da quali altri layout vengono
+generati. La generazione procede a blocchi (shard) di SHARD_SIZE righe, che
+possono essere prodotti in parallelo su più processi senza cambiare l'output.
+
+Esempio (tutti e tre i layout in un'unica esecuzione):
+    python customer_data_generator.py --rows 1000000 --seed 42 --workers 8 \\
+        --layouts base enriched advanced --format parquet
+"""
+
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# --- Configurazione ---
+FIRST_CUSTOMER_ID = 10001  # Inizia da 10001
+SHARD_SIZE = 1_000_000  # Righe per blocco (ogni blocco ha il suo seed derivato)
+
+# --- Liste di valori possibili per le colonne categoriche ---
+NAMES = [
+    "Marco", "Giulia", "Luca", "Sofia", "Alessandro", "Chiara", "Francesco", "Elena", "Matteo", "Valentina",
+    "Andrea", "Alessia", "Simone", "Camilla", "Davide", "Federica", "Stefano", "Elisa", "Roberto", "Martina",
+    "Paolo", "Silvia", "Marco", "Ilaria", "Luigi", "Gaia", "Giorgio", "Sara", "Antonio", "Arianna",
+    "Fabio", "Nicole", "Daniele", "Veronica", "Angelo", "Michela", "Vincenzo", "Debora", "Salvatore", "Serena"
+]
+
+SURNAMES = [
+    "Rossi", "Russo", "Ferrari", "Esposito", "Bianchi", "Romano", "Gallo", "Costa", "Fontana", "Conti",
+    "Ricci", "Bruno", "Moretti", "Marino", "Barbieri", "Lombardi", "Giordano", "Innocenti", "Colombo", "Mancini",
+    "Longo", "Gentile", "Martinelli", "Marchetti", "Bianco", "Lombardo", "Coppola", "Ferrara", "Morelli", "Vitale",
+    "Caruso", "De Luca", "Santoro", "Marini", "Benedetti", "Romano", "Sanna", "Fiore", "Bellini", "Basile"
+]
+
+PAYMENT_METHODS = ["Credit card", "Bank transfer", "Electronic check", "Mailed check"]
+BILLING_METHODS = ["Paper", "Email", "Online Portal"]
+SERVICE_TYPES = ["electricity", "gas", "both"]
+CONTRACT_TYPES = ["month-to-month", "one year", "two year"]
+CUSTOMER_TENURE_TYPES = ["Owner", "Tenant"]
+
+# -----------------------
+
+
+def _pick(rng, values, size, p=None):
+    """Estrae size valori da una lista (come random.choice/random.choices)."""
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=p)]
+
+
+def _randint(rng, low, high, size):
+    """Interi in [low, high] estremi inclusi (come random.randint)."""
+    return rng.integers(low, high + 1, size=size)
+
+
+def _randint_between(rng, low, high):
+    """Interi in [low[i], high[i]] estremi inclusi, con limiti diversi per riga."""
+    return low + np.floor(rng.random(len(low)) * (high - low + 1)).astype(np.int64)
+
+
+# --- Gruppi di colonne ---
+# Ogni gruppo riceve (rng, n, cols, start_id, today), dove cols contiene le
+# colonne dei gruppi da cui dipende, e restituisce un dict di colonne. Le
+# colonne che iniziano con "_" sono di supporto e non finiscono nei file.
+
+def _base_columns(rng, n, cols, start_id, today):
+    """Colonne del layout di base (customer_data_large.csv)."""
+    name = _pick(rng, NAMES, n) + " " + _pick(rng, SURNAMES, n)
+
+    # Genera contract_start_date negli ultimi 5 anni
+    start_date = today - pd.to_timedelta(_randint(rng, 0, 365 * 5, n), unit='D')
+
+    # Più probabilità per month-to-month
+    contract_type_idx = rng.choice(3, size=n, p=[0.4, 0.35, 0.25])
+    month_to_month = contract_type_idx == 0
+
+    # Genera tenure_months coerente con contract_type
+    # month-to-month: 1-24, one year: 10-15, two year: 20-28
+    tenure_months = _randint_between(
+        rng, np.array([1, 10, 20])[contract_type_idx], np.array([24, 15, 28])[contract_type_idx]
+    )
+
+    # Contratto scaduto: 30% di probabilità per month-to-month, 10% per gli altri
+    churn_flag = rng.random(n) < np.where(month_to_month, 0.3, 0.1)
+
+    # Data di fine coerente con tenure_months (approssimazione) più un po' di variabilità
+    end_offset = tenure_months * 30 + _randint(rng, -15, 15, n)
+    contract_end_date = (start_date + pd.to_timedelta(end_offset, unit='D')).where(churn_flag)
+
+    service_type_idx = rng.integers(0, len(SERVICE_TYPES), size=n)
+    payment_method = _pick(rng, PAYMENT_METHODS, n)
+
+    # Genera monthly_charges e total_charges (con un po' di variabilità)
+    base_monthly_charge = rng.uniform(50.0, 120.0, n)
+    variability_factor = rng.uniform(0.95, 1.05, n)
+    monthly_charges = np.round(base_monthly_charge, 1)
+    total_charges = np.round(monthly_charges * tenure_months * variability_factor, 1)
+
+    return {
+        "customer_id": np.arange(start_id, start_id + n, dtype=np.int64),
+        "contract_start_date": start_date,
+        "contract_end_date": contract_end_date,
+        "monthly_charges": monthly_charges,
+        "total_charges": total_charges,
+        "payment_method": payment_method,
+        "tenure_months": tenure_months,
+        "service_type": np.asarray(SERVICE_TYPES, dtype=object)[service_type_idx],
+        "contract_type": np.asarray(CONTRACT_TYPES, dtype=object)[contract_type_idx],
+        "name": name,
+        "_churn_flag": churn_flag,
+        "_month_to_month": month_to_month,
+        "_service_type_idx": service_type_idx,
+        "_base_monthly_charge": base_monthly_charge,
+        "_variability_factor": variability_factor,
+    }
+
+
+def _churn_pricing_columns(rng, n, cols, start_id, today):
+    """Costi con un leggero calo nei mesi finali per i clienti che abbandonano."""
+    base_monthly_charge = cols["_base_monthly_charge"]
+    discounted = cols["_churn_flag"] & (rng.random(n) < 0.4)
+    monthly_charges = np.round(
+        np.where(discounted, base_monthly_charge * rng.uniform(0.8, 0.95, n), base_monthly_charge), 1
+    )
+    total_charges = np.round(monthly_charges * cols["tenure_months"] * cols["_variability_factor"], 1)
+    return {"monthly_charges": monthly_charges, "total_charges": total_charges}
+
+
+def _consumption_columns(rng, n, cols, start_id, today):
+    """avg_monthly_consumption_kwh: electricity 200-400, gas 1000-2000, both 1200-2400."""
+    service_type_idx = cols["_service_type_idx"]
+    return {
+        "avg_monthly_consumption_kwh": _randint_between(
+            rng, np.array([200, 1000, 1200])[service_type_idx], np.array([400, 2000, 2400])[service_type_idx]
+        )
+    }
+
+
+def _support_enriched_columns(rng, n, cols, start_id, today):
+    """num_support_contacts_last_year del dataset arricchito (2-10 per chi abbandona, 0-3 altrimenti)."""
+    churn_flag = cols["_churn_flag"]
+    return {
+        "num_support_contacts_last_year": np.where(churn_flag, _randint(rng, 2, 10, n), _randint(rng, 0, 3, n))
+    }
+
+
+def _support_advanced_columns(rng, n, cols, start_id, today):
+    """num_support_contacts_last_year del dataset avanzato, con correlazione più forte con il churn."""
+    churn_flag = cols["_churn_flag"]
+    return {
+        "num_support_contacts_last_year": np.where(churn_flag, _randint(rng, 3, 15, n), _randint(rng, 0, 4, n))
+    }
+
+
+def _advanced_columns(rng, n, cols, start_id, today):
+    """Caratteristiche avanzate: consumo, fatturazione, comportamento e reclami."""
+    churn_flag = cols["_churn_flag"]
+    month_to_month = cols["_month_to_month"]
+    billing_method = _pick(rng, BILLING_METHODS, n)
+
+    # consumption_volatility: più alta per i clienti che abbandonano
+    base_volatility = rng.uniform(0.1, 0.3, n)  # 10% - 30%
+    consumption_volatility = np.round(
+        np.where(churn_flag, base_volatility * rng.uniform(1.2, 2.0, n), base_volatility), 4
+    )
+
+    # consumption_trend: trend negativo per clienti in procinto di churn
+    falling = churn_flag & (rng.random(n) < 0.6)
+    consumption_trend = np.round(
+        np.where(falling, rng.uniform(-0.05, -0.01, n), rng.uniform(-0.01, 0.01, n)), 4
+    )
+
+    # consumption_vs_local_avg_ratio: consumo molto basso rispetto alla media locale
+    low_consumption = churn_flag & (rng.random(n) < 0.4)
+    consumption_vs_local_avg_ratio = np.round(
+        np.where(low_consumption, rng.uniform(0.5, 0.9, n), rng.uniform(0.9, 1.2, n)), 2
+    )
+
+    # has_promo e days_since_last_promo_end (30-365 giorni se non è in promo)
+    has_promo = rng.random(n) < 0.3
+    days_since_last_promo_end = np.where(has_promo, 0, _randint(rng, 30, 365, n))
+
+    # last_bill_amount_vs_avg: bollette molto alte possono causare churn
+    high_bill = churn_flag & (rng.random(n) < 0.5)
+    last_bill_amount_vs_avg = np.round(
+        np.where(high_bill, rng.uniform(1.5, 3.0, n), rng.uniform(0.8, 1.3, n)), 2
+    )
+
+    # num_late_payments e avg_days_late_payment
+    num_late_payments = np.where(
+        churn_flag, _randint(rng, 1, 5, n), rng.choice(3, size=n, p=[0.8, 0.15, 0.05])
+    )
+
+    # days_to_contract_end: solo per clienti attivi con contratto a termine (1-180 giorni)
+    days_to_contract_end = pd.array(_randint(rng, 1, 180, n), dtype='Int64')
+    days_to_contract_end[churn_flag | month_to_month] = pd.NA
+
+    # num_logins_last_month solo se ha un account online
+    has_online_account = rng.random(n) < 0.6
+
+    # num_paperless_bills_sent: una bolletta al mese per Email/Online Portal
+    paperless = (billing_method == "Email") | (billing_method == "Online Portal")
+
+    # num_complaints_last_year: dal 30% al 100% dei contatti di supporto
+    num_complaints_last_year = (
+        cols["num_support_contacts_last_year"] * rng.uniform(0.3, 1.0, n)
+    ).astype(np.int64)
+
+    return {
+        "consumption_volatility": consumption_volatility,
+        "consumption_trend": consumption_trend,
+        "consumption_vs_local_avg_ratio": consumption_vs_local_avg_ratio,
+        "peak_hour_consumption_ratio": np.round(rng.uniform(0.2, 0.5, n), 2),
+        "smart_meter_flag": rng.random(n) < 0.7,
+        "has_promo": has_promo,
+        "days_since_last_promo_end": days_since_last_promo_end,
+        "num_price_changes_last_year": rng.choice(4, size=n, p=[0.5, 0.3, 0.15, 0.05]),
+        "last_bill_amount_vs_avg": last_bill_amount_vs_avg,
+        "num_late_payments": num_late_payments,
+        "avg_days_late_payment": np.where(num_late_payments > 0, _randint(rng, 5, 30, n), 0),
+        "billing_method": billing_method,
+        # Solo per contratti a termine
+        "contract_renewal_reminder_sent": ~month_to_month & (rng.random(n) < 0.8),
+        "days_to_contract_end": days_to_contract_end,
+        "has_online_account": has_online_account,
+        "num_logins_last_month": np.where(has_online_account, _randint(rng, 0, 20, n), 0),
+        "num_paperless_bills_sent": np.where(paperless, cols["tenure_months"], 0),
+        # NPS-like, da 0 a 10: basso per i clienti insoddisfatti
+        "last_survey_satisfaction_score": np.where(churn_flag, _randint(rng, 0, 6, n), _randint(rng, 7, 10, n)),
+        "num_complaints_last_year": num_complaints_last_year,
+        # Risoluzione tra 1 e 30 giorni se ci sono lamentele
+        "complaint_resolution_time_avg": np.where(num_complaints_last_year > 0, _randint(rng, 1, 30, n), 0),
+        # Demographic/Location (semplici simulazioni)
+        "customer_tenure_type": _pick(rng, CUSTOMER_TENURE_TYPES, n),
+    }
+
+
+# Gruppi registrati: nome -> (funzione, gruppi da cui dipende, chiave per il seed)
+COLUMN_GROUPS = {
+    'base': (_base_columns, [], 0),
+    'churn_pricing': (_churn_pricing_columns, ['base'], 1),
+    'consumption': (_consumption_columns, ['base'], 2),
+    'support_enriched': (_support_enriched_columns, ['base'], 3),
+    'support_advanced': (_support_advanced_columns, ['base'], 4),
+    'advanced': (_advanced_columns, ['base', 'support_advanced'], 5),
+}
+
+BASE_COLUMNS = [
+    "customer_id", "contract_start_date", "contract_end_date", "monthly_charges", "total_charges",
+    "payment_method", "tenure_months", "service_type", "contract_type", "name"
+]
+ENRICHED_COLUMNS = BASE_COLUMNS + ["avg_monthly_consumption_kwh", "num_support_contacts_last_year"]
+ADVANCED_COLUMNS = ENRICHED_COLUMNS + [
+    "consumption_volatility", "consumption_trend", "consumption_vs_local_avg_ratio",
+    "peak_hour_consumption_ratio", "smart_meter_flag", "has_promo", "days_since_last_promo_end",
+    "num_price_changes_last_year", "last_bill_amount_vs_avg", "num_late_payments",
+    "avg_days_late_payment", "billing_method", "contract_renewal_reminder_sent",
+    "days_to_contract_end", "has_online_account", "num_logins_last_month",
+    "num_paperless_bills_sent", "last_survey_satisfaction_score", "num_complaints_last_year",
+    "complaint_resolution_time_avg", "customer_tenure_type"
+]
+
+# Layout: gruppi applicati in ordine (i successivi sovrascrivono le colonne
+# dei precedenti) e colonne scritte nel file
+LAYOUTS = {
+    'base': (['base'], BASE_COLUMNS),
+    'enriched': (['base', 'churn_pricing', 'consumption', 'support_enriched'], ENRICHED_COLUMNS),
+    'advanced': (['base', 'churn_pricing', 'consumption', 'support_advanced', 'advanced'], ADVANCED_COLUMNS),
+}
+
+DEFAULT_OUTPUT_FILES = {
+    'base': "customer_data_large.csv",
+    'enriched': "customer_data_enriched.csv",
+    'advanced': "customer_data_advanced.csv",
+}
+
+
+def _group_rng(seed_sequence, group):
+    """Generatore del gruppo, derivato in modo stabile dal seed del blocco."""
+    key = COLUMN_GROUPS[group][2]
+    return np.random.default_rng(np.random.SeedSequence(
+        entropy=seed_sequence.entropy, spawn_key=tuple(seed_sequence.spawn_key) + (key,)
+    ))
+
+
+def _reference_day(reference_date):
+    """Data di riferimento ("oggi") senza orario."""
+    return pd.Timestamp(reference_date if reference_date is not None else datetime.now()).normalize()
+
+
+def generate_frames(num_records, layouts, seed=None, start_id=FIRST_CUSTOMER_ID, reference_date=None):
+    """
+    Genera uno o più layout in un'unica passata vettoriale.
+
+    :param num_records: Numero di righe
+    :param layouts: Nomi dei layout (chiavi di LAYOUTS)
+    :param seed: Seed (int) o np.random.SeedSequence per la riproducibilità
+    :param start_id: Primo customer_id
+    :param reference_date: Data di riferimento ("oggi") per le date dei contratti
+    :return: Dict layout -> DataFrame
+    """
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    today = _reference_day(reference_date)
+
+    # Ogni gruppo viene calcolato una sola volta, dopo i gruppi da cui dipende
+    outputs = {}
+
+    def compute(group):
+        if group in outputs:
+            return
+        function, dependencies, _ = COLUMN_GROUPS[group]
+        cols = {}
+        for dependency in dependencies:
+            compute(dependency)
+            cols.update(outputs[dependency])
+        outputs[group] = function(_group_rng(seed_sequence, group), num_records, cols, start_id, today)
+
+    frames = {}
+    for layout in layouts:
+        groups, columns = LAYOUTS[layout]
+        merged = {}
+        for group in groups:
+            compute(group)
+            merged.update(outputs[group])
+        frames[layout] = pd.DataFrame({col: merged[col] for col in columns})
+    return frames
+
+
+def generate_customer_data(layout, num_records, seed=None, start_id=FIRST_CUSTOMER_ID,
+                           reference_date=None):
+    """
+    Genera un DataFrame con i dati dei clienti in un layout.
+
+    :param layout: Nome del layout (chiave di LAYOUTS)
+    :param num_records: Numero di righe
+    :param seed: Seed (int) o np.random.SeedSequence per la riproducibilità
+    :param start_id: Primo customer_id
+    :param reference_date: Data di riferimento ("oggi") per le date dei contratti
+    """
+    return generate_frames(num_records, [layout], seed, start_id, reference_date)[layout]
+
+
+class DatasetWriter:
+    """Scrive i blocchi in sequenza su CSV o Parquet (in base all'estensione)."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.parquet = filename.lower().endswith(('.parquet', '.pq'))
+        self._writer = None
+        self.rows = 0
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.filename, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.filename, mode='w' if self.rows == 0 else 'a',
+                      header=self.rows == 0, index=False, date_format='%Y-%m-%d')
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _generate_shard(args):
+    """Genera un blocco per tutti i layout richiesti (eseguito anche nei processi worker)."""
+    seed_sequence, rows, start_id, layouts, reference_date = args
+    return generate_frames(rows, layouts, seed_sequence, start_id, reference_date)
+
+
+def generate_datasets(num_records, outputs, seed=None, workers=1, shard_size=SHARD_SIZE,
+                      reference_date=None):
+    """
+    Genera i layout richiesti a blocchi e li scrive su file senza tenerli tutti in memoria.
+
+    Il blocco i usa il seed i-esimo derivato da seed e i customer_id a partire
+    da FIRST_CUSTOMER_ID + i * shard_size: il risultato dipende solo da seed,
+    shard_size e reference_date, non dal numero di processi.
+
+    :param num_records: Numero totale di righe
+    :param outputs: Dict layout -> file di output (.csv o .parquet)
+    :param seed: Seed per la riproducibilità (None = casuale)
+    :param workers: Processi da usare per generare i blocchi
+    :param shard_size: Righe per blocco
+    :param reference_date: Data di riferimento ("oggi"); fissarla rende l'output riproducibile
+    :return: Numero di righe scritte per ogni file
+    """
+    reference_date = _reference_day(reference_date)
+    layouts = list(outputs)
+    num_shards = max(1, math.ceil(num_records / shard_size))
+    seeds = np.random.SeedSequence(seed).spawn(num_shards)
+    shards = [
+        (seeds[i], min(shard_size, num_records - i * shard_size), FIRST_CUSTOMER_ID + i * shard_size,
+         layouts, reference_date)
+        for i in range(num_shards)
+    ]
+
+    writers = {layout: DatasetWriter(filename) for layout, filename in outputs.items()}
+
+    def write(frames):
+        for layout, df in frames.items():
+            writers[layout].write(df)
+
+    try:
+        if workers <= 1:
+            for shard in shards:
+                write(_generate_shard(shard))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Al massimo 2 blocchi per processo in memoria, scritti nell'ordine originale
+                pending = []
+                for shard in shards:
+                    pending.append(pool.submit(_generate_shard, shard))
+                    if len(pending) >= 2 * workers:
+                        write(pending.pop(0).result())
+                for future in pending:
+                    write(future.result())
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    for layout, writer in writers.items():
+        print(f"Dataset '{layout}' generato e salvato in '{writer.filename}' con {writer.rows} record.")
+    return {layout: writer.rows for layout, writer in writers.items()}
+
+
+def generate_dataset(layout, num_records, filename, seed=None, workers=1, shard_size=SHARD_SIZE,
+                     reference_date=None):
+    """
+    Genera un layout a blocchi e lo scrive su file senza tenerlo tutto in memoria.
+
+    Vedi generate_datasets per gli altri parametri.
+
+    :param layout: Nome del layout (chiave di LAYOUTS)
+    :param filename: File di output (.csv o .parquet)
+    :return: Numero di righe scritte
+    """
+    rows = generate_datasets(num_records, {layout: filename}, seed=seed, workers=workers,
+                             shard_size=shard_size, reference_date=reference_date)
+    return rows[layout]
+
+
+def build_parser(description, default_records, default_output=None):
+    """Opzioni comuni della riga di comando dei generatori."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--rows', type=int, default=default_records, help="Numero di righe da generare")
+    parser.add_argument('--seed', type=int, help="Seed per un output riproducibile")
+    parser.add_argument('--workers', type=int, default=1, help="Processi da usare")
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help="Righe per blocco")
+    parser.add_argument('--reference-date', help="Data di riferimento YYYY-MM-DD (default: oggi)")
+    if default_output is not None:
+        parser.add_argument('--output', default=default_output, help="File di output (.csv o .parquet)")
+    return parser
+
+
+def main(argv=None):
+    """Genera uno o più layout in un'unica esecuzione."""
+    parser = build_parser("Genera i dataset sintetici dei clienti (uno o più layout).", 1000)
+    parser.add_argument('--layouts', nargs='+', choices=list(LAYOUTS), default=list(LAYOUTS),
+                        help="Layout da generare")
+    parser.add_argument('--output-dir', default='.', help="Cartella di output")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="Formato dei file")
+    args = parser.parse_args(argv)
+
+    outputs = {
+        layout: os.path.join(args.output_dir,
+                             os.path.splitext(DEFAULT_OUTPUT_FILES[layout])[0] + '.' + args.format)
+        for layout in args.layouts
+    }
+    print("Generazione dei dataset sintetici...")
+    generate_datasets(args.rows, outputs, seed=args.seed, workers=args.workers,
+                      shard_size=args.shard_size, reference_date=args.reference_date)
+    print("Operazione completata.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""
+Typed customer store for the churn calculators.
+
+The CSV exports are parsed once into compact, typed columns so that the
+calculators never have to convert the same values again:
+- contract dates become datetime64 columns;
+- categorical attributes become pandas categoricals;
+- "True"/"False" flags become booleans;
+- counts are stored in the narrowest integer dtype that fits (a nullable one
+  when the column has gaps);
+- identifiers are always int64 (Int64 when some are missing), so that they
+  can be combined with ids from other sources without overflow.
+
+Columns that are not listed in CUSTOMER_SCHEMA are kept as read by pandas.
+
+When pyarrow is installed, the typed table is also cached on disk in Parquet
+format next to the source file (in CACHE_DIR_NAME). The cache is keyed on the
+source path, size and modification time, so it is rebuilt automatically when
+the CSV changes; later loads read only the requested columns.
+
+An export split into several files (per region, per month, ...) is loaded
+from a list of paths, a directory or a glob pattern: the partitions are parsed
+(or read from their caches) in parallel threads, their categoricals are
+given a common set of categories and the frames are concatenated once, with
+a categorical PARTITION_COLUMN naming the file each row came from.
+"""
+
+import glob
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet cache is optional
+    pa = pq = None
+
+
+# Column kinds understood by apply_schema
+DATE = 'date'
+CATEGORY = 'category'
+BOOL = 'bool'
+COUNT = 'count'
+ID = 'id'
+FLOAT = 'float'
+TEXT = 'text'
+
+CUSTOMER_SCHEMA = {
+    'customer_id': ID,
+    'contract_start_date': DATE,
+    'contract_end_date': DATE,
+    'monthly_charges': FLOAT,
+    'total_charges': FLOAT,
+    'payment_method': CATEGORY,
+    'tenure_months': COUNT,
+    'service_type': CATEGORY,
+    'contract_type': CATEGORY,
+    'name': TEXT,
+    'status': CATEGORY,
+    # Enriched dataset
+    'avg_monthly_consumption_kwh': COUNT,
+    'num_support_contacts_last_year': COUNT,
+    # Advanced dataset
+    'consumption_volatility': FLOAT,
+    'consumption_trend': FLOAT,
+    'consumption_vs_local_avg_ratio': FLOAT,
+    'peak_hour_consumption_ratio': FLOAT,
+    'smart_meter_flag': BOOL,
+    'has_promo': BOOL,
+    'days_since_last_promo_end': COUNT,
+    'num_price_changes_last_year': COUNT,
+    'last_bill_amount_vs_avg': FLOAT,
+    'num_late_payments': COUNT,
+    'avg_days_late_payment': COUNT,
+    'billing_method': CATEGORY,
+    'contract_renewal_reminder_sent': BOOL,
+    'days_to_contract_end': COUNT,
+    'has_online_account': BOOL,
+    'num_logins_last_month': COUNT,
+    'num_paperless_bills_sent': COUNT,
+    'last_survey_satisfaction_score': COUNT,
+    'num_complaints_last_year': COUNT,
+    'complaint_resolution_time_avg': COUNT,
+    'customer_tenure_type': CATEGORY,
+}
+
+# Columns needed by the period churn-rate calculations
+RATE_COLUMNS = ['customer_id', 'contract_start_date', 'contract_end_date']
+
+CACHE_DIR_NAME = '.churn_cache'
+# Bumped when the typed layout changes, so that older cache files are rebuilt
+CACHE_FORMAT_VERSION = 3
+
+# Column added to partitioned loads: file (partition) of each row
+PARTITION_COLUMN = 'source_partition'
+# Files picked up when a directory is given as the source
+PARTITION_PATTERNS = ('*.csv', '*.csv.gz', '*.csv.zst')
+
+_BOOL_VALUES = {'true': True, 'false': False, '1': True, '0': False}
+
+
+def _to_bool(series):
+    """Convert a column of True/False values (or their string form) to booleans."""
+    if series.dtype == bool:
+        return series
+    converted = series.astype(str).str.strip().str.lower().map(_BOOL_VALUES)
+    converted[series.isna()] = np.nan
+    if converted.isna().any():
+        # Keep missing values with the nullable boolean dtype
+        return converted.astype('boolean')
+    return converted.astype(bool)
+
+
+def _to_count(series):
+    """Store a count column in the narrowest integer dtype (nullable if it has gaps)."""
+    values = pd.to_numeric(series, errors='coerce')
+    if values.isna().any():
+        # Counts with missing values (e.g. days_to_contract_end) use the nullable
+        # integer dtypes: float32 would round ids and counts above 2**24
+        present = values.dropna()
+        if (present != np.floor(present)).any():
+            # Fractional values are kept as they are (reported by the validation)
+            return values
+        narrowest = pd.to_numeric(present, downcast='integer').dtype
+        return values.astype(narrowest.name.capitalize())
+    if isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+        # No gaps left (e.g. after quarantining the invalid rows): back to a NumPy dtype
+        values = values.astype(values.dtype.numpy_dtype)
+    return pd.to_numeric(values, downcast='integer')
+
+
+def _to_id(series):
+    """Store an identifier column as int64 (nullable Int64 if it has gaps), never downcast."""
+    values = pd.to_numeric(series, errors='coerce')
+    present = values.dropna()
+    if (present != np.floor(present)).any():
+        # Fractional values are kept as they are (reported by the validation)
+        return values
+    return values.astype('Int64' if values.isna().any() else 'int64')
+
+
+def apply_schema(df, schema=None, errors=None):
+    """
+    Convert the columns of a raw customer DataFrame to their typed representation.
+
+    Values that cannot be converted become missing values.
+
+    :param df: DataFrame as returned by pd.read_csv
+    :param schema: Mapping column -> kind (defaults to CUSTOMER_SCHEMA)
+    :param errors: Optional dict filled with column -> boolean array marking the
+                   values that were present but could not be converted
+    :return: The same DataFrame with converted columns
+    """
+    schema = CUSTOMER_SCHEMA if schema is None else schema
+    for col, kind in schema.items():
+        if col not in df.columns:
+            continue
+        present = df[col].notna().to_numpy() if errors is not None else None
+        if kind == DATE:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        elif kind == CATEGORY:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        elif kind == BOOL:
+            df[col] = _to_bool(df[col])
+        elif kind == COUNT:
+            df[col] = _to_count(df[col])
+        elif kind == ID:
+            df[col] = _to_id(df[col])
+        elif kind == FLOAT:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        if present is not None and kind in (DATE, BOOL, COUNT, ID, FLOAT):
+            errors[col] = present & df[col].isna().to_numpy()
+    return df
+
+
+def _read_csv_dtypes(schema):
+    """dtype mapping for pd.read_csv so that categoricals are built while parsing."""
+    return {col: 'category' for col, kind in schema.items() if kind == CATEGORY}
+
+
+def cache_path_for(path, cache_dir=None):
+    """
+    Path of the Parquet cache file for a source CSV.
+
+    :param path: Path to the source CSV file
+    :param cache_dir: Cache directory (defaults to CACHE_DIR_NAME next to the source)
+    :return: Path of the cache file for the current version of the source
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path), CACHE_DIR_NAME)
+    key = hashlib.sha1(f"{path}|{stat.st_size}|{stat.st_mtime_ns}|{CACHE_FORMAT_VERSION}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{key}.parquet")
+
+
+def _write_cache(df, cache_file):
+    """Write the typed table to the cache atomically and drop stale versions."""
+    cache_dir = os.path.dirname(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, cache_file)
+    finally:
+        # Left over only when the write failed
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    # Remove caches built from older versions of the same source file
+    prefix = os.path.basename(cache_file).rsplit('.', 2)[0] + '.'
+    for name in os.listdir(cache_dir):
+        stale = os.path.join(cache_dir, name)
+        suffix = name[len(prefix):]
+        if (name.startswith(prefix) and suffix.endswith('.parquet') and suffix.count('.') == 1
+                and stale != cache_file):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def _read_cache(cache_file, columns):
+    """Read (a projection of) a cached table."""
+    if columns is not None:
+        available = set(pq.read_schema(cache_file).names)
+        columns = [col for col in columns if col in available]
+    return pd.read_parquet(cache_file, columns=columns)
+
+
+def read_customer_csv(path, schema=None, columns=None, errors=None):
+    """
+    Parse a customer CSV file into a typed DataFrame (no cache).
+
+    :param path: Path to the CSV file
+    :param schema: Mapping column -> kind (defaults to CUSTOMER_SCHEMA)
+    :param columns: Optional list of columns to read (missing ones are ignored)
+    :param errors: Optional dict filled with the conversion failures (see apply_schema)
+    :return: Typed DataFrame
+    """
+    schema = CUSTOMER_SCHEMA if schema is None else schema
+    usecols = None if columns is None else (lambda col: col in columns)
+    df = pd.read_csv(path, dtype=_read_csv_dtypes(schema), usecols=usecols)
+    return apply_schema(df, schema, errors)
+
+
+def iter_customer_csv(path, chunk_size, schema=None, columns=None):
+    """
+    Read a customer CSV file as a sequence of typed chunks (constant memory).
+
+    Each chunk is typed independently, so categoricals only hold the values
+    present in that chunk.
+
+    :param path: Path to the CSV file (compression is inferred from the extension)
+    :param chunk_size: Rows per chunk
+    :param schema: Mapping column -> kind (defaults to CUSTOMER_SCHEMA)
+    :param columns: Optional list of columns to read (missing ones are ignored)
+    :return: Iterator of typed DataFrames
+    """
+    schema = CUSTOMER_SCHEMA if schema is None else schema
+    usecols = None if columns is None else (lambda col: col in columns)
+    reader = pd.read_csv(path, dtype=_read_csv_dtypes(schema), usecols=usecols,
+                         chunksize=chunk_size)
+    for chunk in reader:
+        yield apply_schema(chunk, schema)
+
+
+def load_customer_data(path, schema=None, columns=None, use_cache=True, cache_dir=None):
+    """
+    Read a customer CSV file into a typed DataFrame, going through the Parquet cache.
+
+    On a cache miss the whole file is parsed and cached, then the requested
+    columns are returned; on a hit only the requested columns are read.
+
+    :param path: Path to the CSV file (a list of paths, a directory or a glob pattern
+                 is loaded with load_customer_partitions)
+    :param schema: Mapping column -> kind (defaults to CUSTOMER_SCHEMA)
+    :param columns: Optional list of columns to load (e.g. RATE_COLUMNS)
+    :param use_cache: If False, always parse the CSV
+    :param cache_dir: Cache directory (defaults to CACHE_DIR_NAME next to the source)
+    :return: Typed DataFrame
+    """
+    if is_partitioned(path):
+        return load_customer_partitions(path, schema, columns, use_cache, cache_dir)
+    if not use_cache or pq is None:
+        return read_customer_csv(path, schema, columns)
+
+    cache_file = cache_path_for(path, cache_dir)
+    if os.path.exists(cache_file):
+        return _read_cache(cache_file, columns)
+
+    df = read_customer_csv(path, schema)
+    try:
+        _write_cache(df, cache_file)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        # A read-only location or a column Parquet cannot store (e.g. mixed
+        # ints and strings outside the schema) only costs us the cache, not the load
+        print(f"Warning: could not write cache {cache_file}: {e}")
+    if columns is not None:
+        df = df[[col for col in df.columns if col in columns]]
+    return df
+
+
+def partition_paths(source):
+    """
+    Files of a customer export.
+
+    :param source: Path of a CSV file, a directory (its PARTITION_PATTERNS files),
+                   a glob pattern or a list of any of these
+    :return: Sorted list of file paths (a single file gives a one-element list); a file
+             named more than once in a list is kept once, at its first position
+    """
+    if isinstance(source, (list, tuple)):
+        paths = {}
+        for item in source:
+            for path in partition_paths(item):
+                paths.setdefault(os.path.abspath(path), path)
+        return list(paths.values())
+    source = os.fspath(source)
+    if os.path.isdir(source):
+        paths = [path for pattern in PARTITION_PATTERNS
+                 for path in glob.glob(os.path.join(source, pattern))]
+    elif glob.has_magic(source):
+        paths = glob.glob(source, recursive=True)
+    else:
+        return [source]
+    if not paths:
+        raise FileNotFoundError(f"No customer files match {source}")
+    return sorted(paths)
+
+
+def is_partitioned(source):
+    """True if a source names several files (a list, a directory or a glob pattern)."""
+    if isinstance(source, (list, tuple)):
+        return True
+    source = os.fspath(source)
+    return os.path.isdir(source) or glob.has_magic(source)
+
+
+def partition_names(paths):
+    """
+    Names of partition files: their paths relative to the common directory of all of them.
+
+    :param paths: Partition files
+    :return: List of names (e.g. 'north.csv', '2024/05.csv')
+    """
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    return [os.path.relpath(os.path.abspath(path), root) for path in paths]
+
+
+def read_partitions(paths, reader, workers=None):
+    """
+    Apply a reader to every partition file in parallel.
+
+    Threads are enough: the CSV parser and the Parquet reader spend most of
+    their time in native code that releases the GIL, and no frame has to be
+    pickled back from a worker process.
+
+    :param paths: Partition files
+    :param reader: Callable path -> result
+    :param workers: Number of threads (default: min(number of files, CPU count))
+    :return: List of results, in the order of paths
+    """
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1 or len(paths) <= 1:
+        return [reader(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(reader, paths))
+
+
+def concat_partitions(frames, names):
+    """
+    Concatenate typed partition frames into one table tagged with its partitions.
+
+    Categorical columns (in any partition) get the union of the categories of
+    all partitions first, so that they stay categorical in the result; the
+    partition column is built directly from codes.
+
+    :param frames: Typed DataFrames, one per partition
+    :param names: Partition names (same order; frames with the same name share a category)
+    :return: DataFrame with a fresh RangeIndex and a categorical PARTITION_COLUMN
+    """
+    frames = list(frames)
+    for col in dict.fromkeys(col for frame in frames for col in frame.columns):
+        parts = [frame[col] for frame in frames if col in frame.columns]
+        if any(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            categories = union_categoricals(
+                [part if isinstance(part.dtype, pd.CategoricalDtype) else part.astype('category')
+                 for part in parts], sort_categories=True
+            ).categories
+            for frame in frames:
+                if col in frame.columns:
+                    frame[col] = frame[col].astype(pd.CategoricalDtype(categories))
+    df = pd.concat(frames, ignore_index=True, copy=False)
+    name_codes, categories = pd.factorize(pd.Index(list(names)))
+    codes = np.repeat(name_codes.astype(np.int32), [len(frame) for frame in frames])
+    df[PARTITION_COLUMN] = pd.Categorical.from_codes(codes, categories=categories)
+    return df
+
+
+def load_customer_partitions(source, schema=None, columns=None, use_cache=True, cache_dir=None,
+                             workers=None):
+    """
+    Load a customer export split into several files.
+
+    Every partition goes through load_customer_data (and its own Parquet cache).
+
+    :param source: List of paths, directory or glob pattern (see partition_paths)
+    :param schema: Mapping column -> kind (defaults to CUSTOMER_SCHEMA)
+    :param columns: Optional list of columns to load (e.g. RATE_COLUMNS)
+    :param use_cache: If False, always parse the CSV files
+    :param cache_dir: Cache directory (defaults to CACHE_DIR_NAME next to each file)
+    :param workers: Number of reader threads
+    :return: Typed DataFrame with a PARTITION_COLUMN
+    """
+    paths = partition_paths(source)
+    frames = read_partitions(
+        paths, lambda path: load_customer_data(path, schema, columns, use_cache, cache_dir), workers
+    )
+    return concat_partitions(frames, partition_names(paths))
@@ -0,0 +1,269 @@
+"""
+Vectorized validation of customer exports.
+
+Every check runs column-wise on whole arrays (no per-row Python code), so a
+multi-million-row export is validated in about the time it takes to convert
+its columns:
+- type: values present in the file that could not be converted to the
+  column's kind (dates, numbers, counts, flags), found while the columns are
+  converted by customer_store.apply_schema;
+- missing: rows without a customer_id or a contract_start_date;
+- end_before_start: contract_end_date earlier than contract_start_date;
+- duplicate_id: customer_id appearing on more than one row (all of them);
+- not_integer: count and id columns with fractional values;
+- out_of_range: values outside VALUE_RANGES.
+
+The result is a ValidationReport listing, for each failed check and column,
+the positional indices of the offending rows (row i is line i + 2 of the CSV
+file, after the header). Invalid rows can then be rejected (ValidationError)
+or quarantined: removed from the data and returned separately.
+"""
+
+import numpy as np
+import pandas as pd
+
+from customer_store import (
+    COUNT, CUSTOMER_SCHEMA, DATE, ID, apply_schema, concat_partitions, is_partitioned,
+    partition_names, partition_paths, read_customer_csv, read_partitions
+)
+
+# Validation modes of load_validated_customer_data
+RAISE = 'raise'
+QUARANTINE = 'quarantine'
+VALIDATION_MODES = (RAISE, QUARANTINE)
+
+# Columns every row must have
+REQUIRED_COLUMNS = ['customer_id', 'contract_start_date']
+
+# Allowed (min, max) of the numeric columns, None for an open bound
+VALUE_RANGES = {
+    'customer_id': (0, None),
+    'monthly_charges': (0, None),
+    'total_charges': (0, None),
+    'tenure_months': (0, None),
+    'avg_monthly_consumption_kwh': (0, None),
+    'num_support_contacts_last_year': (0, None),
+    'consumption_volatility': (0, None),
+    'consumption_trend': (-1, 1),
+    'consumption_vs_local_avg_ratio': (0, None),
+    'peak_hour_consumption_ratio': (0, 1),
+    'days_since_last_promo_end': (0, None),
+    'num_price_changes_last_year': (0, None),
+    'last_bill_amount_vs_avg': (0, None),
+    'num_late_payments': (0, None),
+    'avg_days_late_payment': (0, None),
+    'days_to_contract_end': (0, None),
+    'num_logins_last_month': (0, None),
+    'num_paperless_bills_sent': (0, None),
+    'last_survey_satisfaction_score': (0, 10),
+    'num_complaints_last_year': (0, None),
+    'complaint_resolution_time_avg': (0, None),
+}
+
+# Rows listed per issue by ValidationReport.to_frame
+SAMPLE_ROWS = 10
+
+
+class ValidationReport:
+    """Offending row indices of a validated customer table, per check and column."""
+
+    def __init__(self, n_rows, issues):
+        """
+        :param n_rows: Number of validated rows
+        :param issues: List of (check, column, int array of row indices), failed checks only
+        """
+        self.n_rows = n_rows
+        self.issues = issues
+
+    @property
+    def invalid_rows(self):
+        """Sorted indices of the rows failing at least one check."""
+        if not self.issues:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([rows for _, _, rows in self.issues]))
+
+    @property
+    def is_valid(self):
+        return not self.issues
+
+    def row_errors(self):
+        """
+        Failed checks of every invalid row.
+
+        :return: Series indexed by row index, values like 'type:contract_start_date;duplicate_id:customer_id'
+        """
+        if not self.issues:
+            return pd.Series([], dtype=object)
+        rows = np.concatenate([rows for _, _, rows in self.issues])
+        labels = np.concatenate([np.full(len(rows), f"{check}:{column}", dtype=object)
+                                 for check, column, rows in self.issues])
+        return pd.Series(labels, index=rows).groupby(level=0, sort=True).agg(';'.join)
+
+    def to_frame(self):
+        """
+        One line per failed check and column.
+
+        :return: DataFrame with check, column, n_rows and the first row indices
+        """
+        return pd.DataFrame({
+            'check': [check for check, _, _ in self.issues],
+            'column': [column for _, column, _ in self.issues],
+            'n_rows': [len(rows) for _, _, rows in self.issues],
+            'rows': [rows[:SAMPLE_ROWS].tolist() for _, _, rows in self.issues],
+        }, columns=['check', 'column', 'n_rows', 'rows'])
+
+    def to_dict(self):
+        """Report as plain Python objects (e.g. for JSON)."""
+        return {
+            'n_rows': self.n_rows,
+            'n_invalid': int(len(self.invalid_rows)),
+            'issues': [{'check': check, 'column': column, 'rows': rows.tolist()}
+                       for check, column, rows in self.issues],
+        }
+
+    def __str__(self):
+        if self.is_valid:
+            return f"All {self.n_rows} rows passed validation"
+        return (f"{len(self.invalid_rows)} of {self.n_rows} rows failed validation:\n"
+                f"{self.to_frame().to_string(index=False)}")
+
+
+class ValidationError(ValueError):
+    """Raised when a customer table fails validation in 'raise' mode."""
+
+    def __init__(self, report):
+        super().__init__(str(report))
+        self.report = report
+
+
+def validate_customers(df, conversion_errors=None, schema=None, ranges=None):
+    """
+    Check a typed customer DataFrame.
+
+    :param df: DataFrame typed by customer_store.apply_schema (any subset of the columns)
+    :param conversion_errors: Optional dict column -> boolean array of values that could
+                              not be converted (filled by apply_schema / read_customer_csv)
+    :param schema: Mapping column -> kind (defaults to CUSTOMER_SCHEMA)
+    :param ranges: Mapping column -> (min, max) (defaults to VALUE_RANGES)
+    :return: ValidationReport
+    """
+    schema = CUSTOMER_SCHEMA if schema is None else schema
+    ranges = VALUE_RANGES if ranges is None else ranges
+    issues = []
+
+    def add(check, column, mask):
+        rows = np.flatnonzero(mask)
+        if len(rows):
+            issues.append((check, column, rows))
+
+    for column, mask in (conversion_errors or {}).items():
+        add('type', column, mask)
+
+    for column in REQUIRED_COLUMNS:
+        if column in df.columns:
+            # Unconvertible values are already reported as type errors
+            missing = df[column].isna().to_numpy()
+            if conversion_errors and column in conversion_errors:
+                missing = missing & ~conversion_errors[column]
+            add('missing', column, missing)
+
+    if 'contract_start_date' in df.columns and 'contract_end_date' in df.columns:
+        start = df['contract_start_date'].to_numpy(dtype='datetime64[ns]')
+        end = df['contract_end_date'].to_numpy(dtype='datetime64[ns]')
+        # Comparisons with NaT are False, so missing dates never fail this check
+        add('end_before_start', 'contract_end_date', end < start)
+
+    if 'customer_id' in df.columns:
+        # Exact ids (integers, nullable when some are missing): never compare rounded floats
+        ids = df['customer_id']
+        add('duplicate_id', 'customer_id', (ids.duplicated(keep=False) & ids.notna()).to_numpy())
+
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+        if kind in (COUNT, ID) and df[column].dtype.kind == 'f':
+            values = df[column].to_numpy()
+            with np.errstate(invalid='ignore'):
+                add('not_integer', column, np.isfinite(values) & (values != np.floor(values)))
+        if column in ranges and kind != DATE:
+            low, high = ranges[column]
+            values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+            outside = np.zeros(len(values), dtype=bool)
+            with np.errstate(invalid='ignore'):
+                if low is not None:
+                    outside |= values < low
+                if high is not None:
+                    outside |= values > high
+            add('out_of_range', column, outside)
+
+    return ValidationReport(len(df), issues)
+
+
+def quarantine(df, report):
+    """
+    Split a table into its valid and invalid rows.
+
+    :param df: Validated DataFrame
+    :param report: Its ValidationReport
+    :return: Tuple (valid rows with a fresh RangeIndex, invalid rows indexed by their
+             original row index with a 'validation_errors' column)
+    """
+    invalid = np.zeros(len(df), dtype=bool)
+    invalid[report.invalid_rows] = True
+    rejected = df.iloc[invalid].copy()
+    rejected.index = np.flatnonzero(invalid)
+    rejected['validation_errors'] = report.row_errors().reindex(rejected.index).to_numpy()
+    return df.iloc[~invalid].reset_index(drop=True), rejected
+
+
+def _read_validated_partitions(source, schema, columns):
+    """Parse partition files in parallel, keeping the conversion failures of each row."""
+    paths = partition_paths(source)
+
+    def read(path):
+        errors = {}
+        return read_customer_csv(path, schema, columns, errors=errors), errors
+
+    parts = read_partitions(paths, read)
+    frames = [frame for frame, _ in parts]
+    conversion_errors = {
+        col: np.concatenate([errors[col] if col in errors else np.zeros(len(frame), dtype=bool)
+                             for frame, errors in parts])
+        for col in set().union(*(errors for _, errors in parts))
+    }
+    return concat_partitions(frames, partition_names(paths)), conversion_errors
+
+
+def load_validated_customer_data(path, mode=RAISE, schema=None, columns=None):
+    """
+    Read and validate a customer CSV file.
+
+    The CSV itself is always parsed (the Parquet cache only holds converted
+    values, where unparseable ones can no longer be told from missing ones).
+
+    :param path: Path to the CSV file, or a list of paths, a directory or a glob
+                 pattern (the partitions are validated together, so duplicate ids
+                 across files are found too)
+    :param mode: 'raise' to raise ValidationError on any invalid row, 'quarantine'
+                 to drop the invalid rows and return them separately
+    :param schema: Mapping column -> kind (defaults to CUSTOMER_SCHEMA)
+    :param columns: Optional list of columns to load and validate
+    :return: Tuple (typed DataFrame, ValidationReport, quarantined rows or None)
+    """
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode {mode!r}: expected one of {VALIDATION_MODES}")
+    schema = CUSTOMER_SCHEMA if schema is None else schema
+
+    if is_partitioned(path):
+        df, conversion_errors = _read_validated_partitions(path, schema, columns)
+    else:
+        conversion_errors = {}
+        df = read_customer_csv(path, schema, columns, errors=conversion_errors)
+    report = validate_customers(df, conversion_errors, schema)
+    if report.is_valid:
+        return df, report, None
+    if mode == RAISE:
+        raise ValidationError(report)
+    df, rejected = quarantine(df, report)
+    # Without the bad values the columns fit their narrowest types again
+    return apply_schema(df, schema), report, rejected
@@ -1,121 +1,68 @@
 """
 Script per generare un dataset sintetico più grande per il churn rate calculator.
 Basato sul formato del file customer_data.csv esistente.
+
+Le colonne sono prodotte dal motore comune customer_data_generator (layout
+'base'), in un'unica passata vettoriale. Con --seed l'output è riproducibile.
+
+Esempio:
+    python generate_large_customer_data.py --rows 1000000 --seed 42 --workers 4
 """
 
-import csv
-import random
-from datetime import datetime, timedelta
-import itertools
+import customer_data_generator as engine
+from customer_data_generator import FIRST_CUSTOMER_ID, SHARD_SIZE
 
 # --- Configurazione ---
-NUM_RECORDS = 1000  # Numero di righe da generare
+NUM_RECORDS = 1000  # Numero di righe da generare (default)
 OUTPUT_FILE = "customer_data_large.csv"
-
-# --- Liste di valori possibili per le colonne categoriche ---
-NAMES = [
-    "Marco", "Giulia", "Luca", "Sofia", "Alessandro", "Chiara", "Francesco", "Elena", "Matteo", "Valentina",
-    "Andrea", "Alessia", "Simone", "Camilla", "Davide", "Federica", "Stefano", "Elisa", "Roberto", "Martina",
-    "Paolo", "Silvia", "Marco", "Ilaria", "Luigi", "Gaia", "Giorgio", "Sara", "Antonio", "Arianna",
-    "Fabio", "Nicole", "Daniele", "Veronica", "Angelo", "Michela", "Vincenzo", "Debora", "Salvatore", "Serena"
-]
-
-SURNAMES = [
-    "Rossi", "Russo", "Ferrari", "Esposito", "Bianchi", "Romano", "Gallo", "Costa", "Fontana", "Conti",
-    "Ricci", "Bruno", "Moretti", "Marino", "Barbieri", "Lombardi", "Giordano", "Innocenti", "Colombo", "Mancini",
-    "Longo", "Gentile", "Martinelli", "Marchetti", "Bianco", "Lombardo", "Coppola", "Ferrara", "Morelli", "Vitale",
-    "Caruso", "De Luca", "Santoro", "Marini", "Benedetti", "Romano", "Sanna", "Fiore", "Bellini", "Basile"
-]
-
-PAYMENT_METHODS = ["Credit card", "Bank transfer", "Electronic check", "Mailed check"]
-SERVICE_TYPES = ["electricity", "gas", "both"]
-CONTRACT_TYPES = ["month-to-month", "one year", "two year"]
+LAYOUT = 'base'
 
 # -----------------------
 
-def generate_customer_data(num_records):
+
+def generate_customer_data(num_records, seed=None, start_id=FIRST_CUSTOMER_ID, reference_date=None):
     """
-    Genera una lista di dizionari rappresentanti i dati dei clienti.
+    Genera un DataFrame con i dati dei clienti nel layout di base.
+
+    Vedi customer_data_generator.generate_customer_data per i parametri.
     """
-    data = []
-    customer_id_counter = itertools.count(10001) # Inizia da 10001
-
-    for _ in range(num_records):
-        customer_id = next(customer_id_counter)
-        name = f"{random.choice(NAMES)} {random.choice(SURNAMES)}"
-        
-        # Genera contract_start_date negli ultimi 5 anni
-        start_date = datetime.now() - timedelta(days=random.randint(0, 365 * 5))
-        contract_start_date = start_date.strftime("%Y-%m-%d")
-
-        contract_type = random.choices(CONTRACT_TYPES, weights=[0.4, 0.35, 0.25])[0] # Più probabilità per month-to-month
-        
-        # Genera tenure_months coerente con contract_type
-        if contract_type == "month-to-month":
-            tenure_months = random.randint(1, 24)
-        elif contract_type == "one year":
-             # Un po' di flessibilità: 10-15 mesi per "one year"
-            tenure_months = random.randint(10, 15) 
-        else: # two year
-            # Un po' di flessibilità: 20-28 mesi per "two year"
-            tenure_months = random.randint(20, 28) 
-
-        # Genera contract_end_date
-        contract_end_date = ""
-        # Se il contratto è scaduto (es. 30% di probabilità per month-to-month, 10% per gli altri)
-        if (contract_type == "month-to-month" and random.random() < 0.3) or \
-           (contract_type != "month-to-month" and random.random() < 0.1):
-            # Imposta una data di fine coerente con tenure_months
-            end_date = start_date + timedelta(days=tenure_months * 30) # Approssimazione
-            # Aggiungi un po' di variabilità alla data di fine
-            end_date += timedelta(days=random.randint(-15, 15))
-            contract_end_date = end_date.strftime("%Y-%m-%d")
-
-        service_type = random.choice(SERVICE_TYPES)
-        payment_method = random.choice(PAYMENT_METHODS)
-        
-        # Genera monthly_charges
-        monthly_charges = round(random.uniform(50.0, 120.0), 1)
-        
-        # Calcola total_charges (con un po' di variabilità)
-        # Potrebbe includere costi iniziali o arrotondamenti
-        variability_factor = random.uniform(0.95, 1.05)
-        total_charges = round(monthly_charges * tenure_months * variability_factor, 1)
-
-        data.append({
-            "customer_id": customer_id,
-            "contract_start_date": contract_start_date,
-            "contract_end_date": contract_end_date,
-            "monthly_charges": monthly_charges,
-            "total_charges": total_charges,
-            "payment_method": payment_method,
-            "tenure_months": tenure_months,
-            "service_type": service_type,
-            "contract_type": contract_type,
-            "name": name
-        })
-        
-    return data
+    return engine.generate_customer_data(LAYOUT, num_records, seed, start_id, reference_date)
+
 
 def write_to_csv(data, filename):
     """
-    Scrive i dati in un file CSV.
+    Scrive i dati in un file CSV (o Parquet se l'estensione è .parquet).
     """
-    if not data:
+    if data is None or len(data) == 0:
         print("Nessun dato da scrivere.")
         return
 
-    fieldnames = data[0].keys()
-    
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(data)
-        
+    with engine.DatasetWriter(filename) as writer:
+        writer.write(data)
     print(f"Dataset generato e salvato in '{filename}' con {len(data)} record.")
 
-if __name__ == "__main__":
+
+def generate_dataset(num_records, filename, seed=None, workers=1, shard_size=SHARD_SIZE,
+                     reference_date=None):
+    """
+    Genera il dataset a blocchi e lo scrive su file senza tenerlo tutto in memoria.
+
+    Vedi customer_data_generator.generate_datasets per i parametri.
+    """
+    return engine.generate_dataset(LAYOUT, num_records, filename, seed=seed, workers=workers,
+                                   shard_size=shard_size, reference_date=reference_date)
+
+
+def main(argv=None):
+    """Legge le opzioni dalla riga di comando e genera il dataset."""
+    parser = engine.build_parser("Genera un dataset sintetico di clienti di grandi dimensioni.", NUM_RECORDS, OUTPUT_FILE)
+    args = parser.parse_args(argv)
+
     print("Generazione del dataset sintetico...")
-    customer_data = generate_customer_data(NUM_RECORDS)
-    write_to_csv(customer_data, OUTPUT_FILE)
+    generate_dataset(args.rows, args.output, seed=args.seed, workers=args.workers,
+                     shard_size=args.shard_size, reference_date=args.reference_date)
     print("Operazione completata.")
+
+
+if __name__ == "__main__":
+    main()
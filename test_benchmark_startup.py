@@ -0,0 +1,10 @@
+"""Startup regression test of the CLI entry point (run with: python -m pytest)."""
+
+from benchmark_churn_pipeline import DEFAULT_STARTUP_BUDGET, STARTUP_MODULE, measure_startup
+
+
+def test_cli_import_stays_light_and_within_budget():
+    seconds, loaded = measure_startup()
+
+    assert loaded == [], f"import {STARTUP_MODULE} loaded heavy modules: {', '.join(loaded)}"
+    assert seconds <= DEFAULT_STARTUP_BUDGET
@@ -0,0 +1,42 @@
+"""Regression tests of customer_validation (run with: python -m pytest)."""
+
+import pandas as pd
+
+from customer_validation import QUARANTINE, load_validated_customer_data
+
+# Above 2**24: float32 cannot tell consecutive ids apart
+FIRST_ID = 123456789
+
+
+def _write_customers(path, ids):
+    pd.DataFrame({
+        'customer_id': ids,
+        'contract_start_date': '2024-01-01',
+        'contract_end_date': '',
+    }).to_csv(path, index=False)
+
+
+def test_large_ids_with_a_blank_id_are_not_duplicates(tmp_path):
+    path = tmp_path / 'customers.csv'
+    ids = [str(FIRST_ID + i) for i in range(20)]
+    ids[3] = ''
+    _write_customers(path, ids)
+
+    df, report, rejected = load_validated_customer_data(path, mode=QUARANTINE)
+
+    assert [(check, column, rows.tolist()) for check, column, rows in report.issues] == [
+        ('missing', 'customer_id', [3])
+    ]
+    assert rejected.index.tolist() == [3]
+    assert df['customer_id'].tolist() == [FIRST_ID + i for i in range(20) if i != 3]
+
+
+def test_duplicate_large_ids_are_found_next_to_a_blank_id(tmp_path):
+    path = tmp_path / 'customers.csv'
+    ids = [str(FIRST_ID + i) for i in range(5)] + ['', str(FIRST_ID + 4)]
+    _write_customers(path, ids)
+
+    _, report, _ = load_validated_customer_data(path, mode=QUARANTINE)
+
+    duplicates = [rows.tolist() for check, _, rows in report.issues if check == 'duplicate_id']
+    assert duplicates == [[4, 6]]